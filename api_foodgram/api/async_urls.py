@@ -0,0 +1,22 @@
+from django.urls import re_path
+
+from .async_views import pooled
+from .urls import router
+
+ASYNC_ROUTES = (
+    'recipes-list',
+    'recipes-detail',
+    'recipes-download_shopping_cart',
+    'recipes-similar',
+    'recipes-feed',
+    'ingredients-list',
+    'ingredients-detail',
+    'tags-list',
+    'tags-detail',
+)
+
+urlpatterns = [
+    re_path(str(pattern.pattern), pooled(pattern.callback), name=pattern.name)
+    for pattern in router.urls
+    if pattern.name in ASYNC_ROUTES
+]
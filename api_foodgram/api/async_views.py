@@ -0,0 +1,49 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from .profiling import profiling_active
+
+
+def run_view(view, request, *args, **kwargs):
+    """Выполняет синхронную вьюху DRF и отрисовывает ответ.
+
+    Поток пула не получает request_finished, поэтому устаревшие
+    соединения с БД закрываются здесь, как в конце WSGI-запроса.
+    """
+
+    close_old_connections()
+
+    try:
+        response = view(request, *args, **kwargs)
+
+        if callable(getattr(response, 'render', None)):
+            response.render()
+
+        return response
+    finally:
+        close_old_connections()
+
+
+def pooled(view):
+    """Асинхронный вариант вьюхи DRF.
+
+    Django 3.2 и DRF синхронны, а синхронные вьюхи под ASGI
+    выполняются по одной в общем потоке процесса. Здесь вьюха
+    выполняется в пуле потоков (thread_sensitive=False), а ответ
+    клиенту отправляет цикл событий. Ответ тот же, что под WSGI:
+    права, фильтры, пагинация, лимиты и бюджеты запросов общие.
+    Профилируемый запрос выполняется в потоке профиля.
+    """
+
+    run = sync_to_async(run_view, thread_sensitive=False)
+    run_profiled = sync_to_async(run_view)
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        runner = run_profiled if profiling_active.get() else run
+
+        return await runner(view, request, *args, **kwargs)
+
+    return async_view
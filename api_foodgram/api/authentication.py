@@ -0,0 +1,159 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+from . import metrics
+
+metrics.HELP['foodgram_token_auth_cache_total'] = (
+    'Обращения к кешу токенов авторизации.'
+)
+
+
+def get_shared_key(key: str) -> str:
+    return 'token_auth:token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_revoked_key(key: str) -> str:
+    return 'token_auth:revoked:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+class TokenCache:
+    """Ограниченный LRU-кеш токенов процесса со временем жизни записей.
+
+    Если задан TOKEN_AUTH_SHARED_CACHE, записи дублируются в общем кеше,
+    а отзыв токена оставляет в нём метку на TOKEN_AUTH_CACHE_TTL секунд.
+    Метка читается при каждом обращении вместе с общей записью, и процесс
+    сбрасывает свою запись отозванного токена, поэтому отзыв действует
+    во всех процессах сразу и не трогает токены других пользователей.
+    Без общего кеша остальные процессы принимают отозванный токен
+    ещё до TOKEN_AUTH_CACHE_TTL секунд.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self):
+        alias = settings.TOKEN_AUTH_SHARED_CACHE
+        return caches[alias] if alias else None
+
+    def get_local(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is not None and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                return entry[1]
+
+            self.entries.pop(key, None)
+
+        return None
+
+    def get(self, key: str):
+        if self.shared is None:
+            return self.get_local(key)
+
+        found = self.shared.get_many(
+            [get_shared_key(key), get_revoked_key(key)]
+        )
+
+        if get_revoked_key(key) in found:
+            with self.lock:
+                self.entries.pop(key, None)
+
+            return None
+
+        value = self.get_local(key)
+
+        if value is not None:
+            return value
+
+        value = found.get(get_shared_key(key))
+
+        if value is not None:
+            self.set_local(key, value)
+
+        return value
+
+    def set_local(self, key: str, value) -> None:
+        with self.lock:
+            self.entries[key] = (
+                time.monotonic() + settings.TOKEN_AUTH_CACHE_TTL,
+                value
+            )
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > settings.TOKEN_AUTH_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def set(self, key: str, value) -> None:
+        """Сохраняет токен, прочитанный из БД после get.
+        Если токен за это время отозвали, чтение могло вернуть
+        старые данные, и запись пропускается.
+        """
+
+        if self.shared is not None and self.shared.get(
+            get_revoked_key(key)
+        ):
+            return
+
+        self.set_local(key, value)
+
+        if self.shared is not None:
+            self.shared.set(
+                get_shared_key(key),
+                value,
+                settings.TOKEN_AUTH_CACHE_TTL
+            )
+
+    def revoke(self, keys=(), user_id=None) -> None:
+        """Удаляет токены по ключам и все токены пользователя."""
+
+        keys = set(keys)
+
+        with self.lock:
+            for key, (_, (user, _)) in list(self.entries.items()):
+                if key in keys or user.pk == user_id:
+                    keys.add(key)
+                    del self.entries[key]
+
+        if self.shared is None or not keys:
+            return
+
+        self.shared.set_many(
+            {get_revoked_key(key): True for key in keys},
+            settings.TOKEN_AUTH_CACHE_TTL
+        )
+        self.shared.delete_many([get_shared_key(key) for key in keys])
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без обращения к БД на каждый запрос."""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+
+        if cached is not None:
+            token_cache.hits += 1
+            metrics.inc('foodgram_token_auth_cache_total', result='hit')
+            user, token = cached
+            return copy.copy(user), token
+
+        token_cache.misses += 1
+        metrics.inc('foodgram_token_auth_cache_total', result='miss')
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, (copy.copy(user), token))
+
+        return user, token
@@ -0,0 +1,82 @@
+import gzip
+import hashlib
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+from services import ingredients
+
+from .serializers import IngredientSerializer
+
+VERSION_KEY = 'ingredients:catalog_version'
+
+
+class CatalogSnapshot:
+    """Готовый JSON полного каталога ингредиентов: исходный и gzip."""
+
+    def __init__(self, version: str):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.raw = JSONRenderer().render(IngredientSerializer(
+            ingredients.get_all_ingredients(),
+            many=True
+        ).data)
+        self.gzipped = gzip.compress(self.raw, compresslevel=9, mtime=0)
+        digest = hashlib.sha256(self.raw).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+
+
+def get_catalog_version() -> str:
+    """Возвращает текущую версию каталога из общего кеша."""
+
+    return cache.get_or_set(VERSION_KEY, lambda: uuid.uuid4().hex, None)
+
+
+def bump_catalog_version() -> None:
+    """Помечает снимок каталога устаревшим во всех процессах."""
+
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+class SnapshotHolder:
+    """Хранит снимок каталога процесса."""
+
+    def __init__(self):
+        self.snapshot = None
+        self.lock = threading.Lock()
+
+    def is_fresh(self, snapshot, version: str) -> bool:
+        return (
+            snapshot is not None
+            and snapshot.version == version
+            and time.monotonic() - snapshot.built_at
+            < settings.INGREDIENT_CATALOG_MAX_AGE
+        )
+
+    def get(self) -> CatalogSnapshot:
+        version = get_catalog_version()
+        snapshot = self.snapshot
+
+        if self.is_fresh(snapshot, version):
+            return snapshot
+
+        with self.lock:
+            if self.snapshot is None or self.snapshot is snapshot:
+                self.snapshot = CatalogSnapshot(version)
+
+            return self.snapshot
+
+
+holder = SnapshotHolder()
+
+
+def get_catalog_snapshot() -> CatalogSnapshot:
+    """Возвращает снимок каталога, пересобирая его при смене версии
+    или по истечении INGREDIENT_CATALOG_MAX_AGE секунд.
+    """
+
+    return holder.get()
@@ -0,0 +1,99 @@
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from django.conf import settings
+from django.urls import reverse
+from services import jobs
+
+# Варианты ответа в кеше nginx ($api_cache_encoding в nginx.conf).
+ENCODINGS = ('gzip', 'identity')
+
+# Ключ кеша nginx включает строку запроса ($request_uri), а обновляются
+# только канонические пути без неё. Ответы с ?page=, ?tags=, ?author=,
+# ?is_favorited=, ?name= и другими параметрами не обновляются и живут
+# до истечения proxy_cache_valid (5 секунд).
+
+
+def get_recipe_paths(recipe_id: int) -> list:
+    """Пути в кеше nginx, которые меняются вместе с рецептом."""
+
+    return [
+        reverse('recipes-list'),
+        reverse('recipes-detail', args=(recipe_id,)),
+    ]
+
+
+def get_tag_paths(tag_id: int) -> list:
+    """Пути в кеше nginx, которые меняются вместе с тегом."""
+
+    return [
+        reverse('tags-list'),
+        reverse('tags-detail', args=(tag_id,)),
+        reverse('recipes-list'),
+    ]
+
+
+def get_ingredient_paths(ingredient_id: int) -> list:
+    """Пути в кеше nginx, которые меняются вместе с ингредиентом."""
+
+    return [
+        reverse('ingredients-list'),
+        reverse('ingredients-detail', args=(ingredient_id,)),
+    ]
+
+
+def refresh_path(path: str, host: str, encoding: str) -> int:
+    """Запрашивает путь у служебного сервера nginx мимо кеша,
+    чтобы свежий ответ заменил сохранённый. Возвращает код ответа.
+    """
+
+    request = urllib.request.Request(
+        urllib.parse.urljoin(settings.NGINX_PURGE_URL, path),
+        headers={
+            'Host': host,
+            'Accept': 'application/json',
+            'Accept-Encoding': encoding,
+        }
+    )
+
+    try:
+        with urllib.request.urlopen(
+            request, timeout=settings.NGINX_PURGE_TIMEOUT
+        ) as response:
+            response.read()
+
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+
+
+def refresh_paths(paths) -> None:
+    """Обновляет пути в кеше nginx для всех имён сайта и вариантов
+    сжатия.
+    """
+
+    hosts = settings.NGINX_PURGE_HOSTS or [
+        urllib.parse.urlsplit(settings.NGINX_PURGE_URL).netloc
+    ]
+
+    for path in paths:
+        for host in hosts:
+            for encoding in ENCODINGS:
+                refresh_path(path, host, encoding)
+
+
+def schedule_refresh(paths) -> None:
+    """Ставит обновление путей в кеше nginx в очередь задач.
+    Без NGINX_PURGE_URL ничего не делает.
+
+    Повторять задачу незачем: за время задержки повтора
+    запись кеша устареет сама.
+    """
+
+    if not settings.NGINX_PURGE_URL:
+        return
+
+    jobs.enqueue(
+        refresh_paths, args=(sorted(set(paths)),), priority=5, max_attempts=1
+    )
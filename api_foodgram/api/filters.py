@@ -1,8 +1,10 @@
 import django_filters
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework
-from recipes.models import Recipe
+from recipes.models import Favorite, Recipe, ShoppingCart
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import SearchFilter
-from services import tags
+from services import tags, trending
 
 
 class RecipeFilter(django_filters.FilterSet):
@@ -18,26 +20,56 @@ class RecipeFilter(django_filters.FilterSet):
     )
     is_in_shopping_cart = rest_framework.BooleanFilter(
         method='get_is_recipe_in_shopping_cart')
+    ordering = django_filters.CharFilter(method='get_ordering')
 
     class Meta:
         model = Recipe
         fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
 
-    def get_is_recipe_in_favorited(self, queryset, _, value):
+    def filter_by_user_list(self, queryset, model, value):
+        """Фильтрует рецепты коррелированным EXISTS / NOT EXISTS
+        по индексу (user_id, recipe_id) списка пользователя.
+        Для анонимного пользователя фильтр не применяется.
+        """
+
         user = self.request.user
 
-        if value and not user.is_anonymous:
-            return queryset.filter(favorites__user=user)
+        if value is None or user.is_anonymous:
+            return queryset
+
+        in_list = Exists(
+            model.objects.filter(user=user, recipe=OuterRef('pk'))
+        )
 
-        return queryset
+        return queryset.filter(in_list if value else ~in_list)
+
+    def get_is_recipe_in_favorited(self, queryset, _, value):
+        return self.filter_by_user_list(queryset, Favorite, value)
 
     def get_is_recipe_in_shopping_cart(self, queryset, _, value):
-        user = self.request.user
+        return self.filter_by_user_list(queryset, ShoppingCart, value)
+
+    def get_ordering(self, queryset, _, value):
+        """Сортировка ordering=trending: по числу добавлений
+        в избранное и покупки за окно window (по умолчанию 7d).
+        """
+
+        if value != 'trending':
+            raise ValidationError(
+                {'ordering': 'Доступна только сортировка trending.'}
+            )
+
+        days = trending.parse_window(
+            self.data.get('window', trending.DEFAULT_WINDOW)
+        )
 
-        if value and not user.is_anonymous:
-            return queryset.filter(shopping_cart__user=user)
+        if days is None:
+            raise ValidationError({
+                'window': 'Укажите окно в сутках, например 7d, '
+                          'не больше TRENDING_MAX_WINDOW_DAYS.'
+            })
 
-        return queryset
+        return trending.order_by_trending(queryset, days)
 
 
 class IngredientFilter(SearchFilter):
@@ -0,0 +1,290 @@
+import base64
+import json
+import math
+import os
+import time
+import tracemalloc
+
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from recipes.management.commands.generate_data import SYNTHETIC_IMAGE_CONTENT
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.authtoken.models import Token
+from users.models import CustomUser
+
+IMAGE = 'data:image/png;base64,' + base64.b64encode(
+    SYNTHETIC_IMAGE_CONTENT
+).decode()
+TRANSACTION_STATEMENTS = (
+    'BEGIN', 'SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK'
+)
+
+
+def percentile(values: list, rank: float) -> float:
+    """Процентиль по методу ближайшего ранга.
+    Для пустого списка возвращает None.
+    """
+
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    index = max(math.ceil(rank / 100 * len(ordered)) - 1, 0)
+
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет все эндпоинты api/urls.py через тестовый клиент Django '
+        'и выводит в JSON p50/p95/p99 задержки, число SQL-запросов '
+        'и пиковую память на запрос. Изменяющие запросы откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--username',
+            help='Пользователь, от имени которого выполняются запросы'
+        )
+        parser.add_argument(
+            '--password',
+            help='Пароль пользователя для замера /api/auth/token/login/'
+        )
+        parser.add_argument('--output', help='Файл для JSON-отчёта')
+
+    def get_user(self, username) -> CustomUser:
+        users = CustomUser.objects.order_by('id')
+
+        if username:
+            users = users.filter(username=username)
+
+        user = users.filter(recipes__isnull=False).first() or users.first()
+
+        if user is None:
+            raise CommandError(
+                'Нет пользователей. Создайте данные командой generate_data.'
+            )
+
+        return user
+
+    def get_endpoints(self, user, password) -> list:
+        recipe = Recipe.objects.exclude(author=user).first()
+        own_recipe = Recipe.objects.filter(author=user).first()
+        author = CustomUser.objects.exclude(id=user.id).first()
+        ingredient = Ingredient.objects.order_by('id').first()
+        tag = Tag.objects.order_by('id').first()
+
+        if not all((recipe, author, ingredient, tag)):
+            raise CommandError(
+                'Недостаточно данных. Создайте их командой generate_data.'
+            )
+
+        batch_ids = ','.join(
+            str(recipe_id) for recipe_id in Recipe.objects.order_by(
+                '-id'
+            ).values_list('id', flat=True)[:10]
+        )
+        recipe_data = {
+            'ingredients': [{'id': ingredient.id, 'amount': 10}],
+            'tags': [tag.id],
+            'name': 'Рецепт для замера',
+            'image': IMAGE,
+            'text': 'Описание',
+            'cooking_time': 10,
+        }
+        endpoints = [
+            ('metrics', 'get', '/api/metrics/', None),
+            ('changes', 'get', '/api/changes/?since=0', None),
+            ('ingredients-list', 'get', '/api/ingredients/', None),
+            (
+                'ingredients-search', 'get',
+                f'/api/ingredients/?name={ingredient.name[:2]}', None
+            ),
+            (
+                'ingredients-detail', 'get',
+                f'/api/ingredients/{ingredient.id}/', None
+            ),
+            ('tags-list', 'get', '/api/tags/', None),
+            ('tags-detail', 'get', f'/api/tags/{tag.id}/', None),
+            ('recipes-list', 'get', '/api/recipes/', None),
+            (
+                'recipes-list-tags', 'get',
+                f'/api/recipes/?tags={tag.slug}', None
+            ),
+            (
+                'recipes-list-favorited', 'get',
+                '/api/recipes/?is_favorited=1', None
+            ),
+            (
+                'recipes-list-shopping-cart', 'get',
+                '/api/recipes/?is_in_shopping_cart=1', None
+            ),
+            ('recipes-detail', 'get', f'/api/recipes/{recipe.id}/', None),
+            (
+                'recipes-similar', 'get',
+                f'/api/recipes/{recipe.id}/similar/', None
+            ),
+            (
+                'recipes-batch', 'get',
+                f'/api/recipes/batch/?ids={batch_ids}', None
+            ),
+            ('recipes-create', 'post', '/api/recipes/', recipe_data),
+            (
+                'recipes-favorite-add', 'post',
+                f'/api/recipes/{recipe.id}/favorite/', None
+            ),
+            (
+                'recipes-shopping-cart-add', 'post',
+                f'/api/recipes/{recipe.id}/shopping_cart/', None
+            ),
+            (
+                'recipes-download-shopping-cart', 'get',
+                '/api/recipes/download_shopping_cart/', None
+            ),
+            (
+                'recipes-meal-plan', 'post', '/api/recipes/meal_plan/',
+                {'recipes': [{'id': recipe.id, 'amount': 2}]}
+            ),
+            ('recipes-feed', 'get', '/api/recipes/feed/', None),
+            ('users-list', 'get', '/api/users/', None),
+            (
+                'users-create', 'post', '/api/users/', {
+                    'email': 'benchmark@example.com',
+                    'username': 'benchmark',
+                    'first_name': 'Замер',
+                    'last_name': 'Замеров',
+                    'password': 'Benchmark-password-1',
+                }
+            ),
+            ('users-detail', 'get', f'/api/users/{author.id}/', None),
+            ('users-me', 'get', '/api/users/me/', None),
+            ('users-subscriptions', 'get', '/api/users/subscriptions/', None),
+            (
+                'users-subscribe', 'post',
+                f'/api/users/{author.id}/subscribe/', None
+            ),
+        ]
+
+        if own_recipe is not None:
+            endpoints += [
+                (
+                    'recipes-update', 'patch',
+                    f'/api/recipes/{own_recipe.id}/',
+                    {'name': 'Новое название', 'cooking_time': 5}
+                ),
+                (
+                    'recipes-delete', 'delete',
+                    f'/api/recipes/{own_recipe.id}/', None
+                ),
+            ]
+
+        if password:
+            endpoints += [
+                (
+                    'auth-token-login', 'post', '/api/auth/token/login/',
+                    {'email': user.email, 'password': password}
+                ),
+                ('auth-token-logout', 'post', '/api/auth/token/logout/', None),
+            ]
+
+        return endpoints
+
+    def request(self, client, method, path, data):
+        """Выполняет запрос и откатывает все его изменения в БД."""
+
+        with transaction.atomic():
+            response = getattr(client, method)(
+                path,
+                data=json.dumps(data) if data is not None else None,
+                content_type='application/json'
+            )
+            transaction.set_rollback(True)
+
+        if method == 'post' and path == '/api/recipes/':
+            image = response.json().get('image')
+
+            if image:
+                default_storage.delete(
+                    'recipes/' + os.path.basename(image)
+                )
+
+        return response
+
+    def measure(self, client, endpoint, iterations, warmup) -> dict:
+        _, method, path, data = endpoint
+
+        for _ in range(warmup):
+            self.request(client, method, path, data)
+
+        timings = []
+        queries_count = None
+
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = self.request(client, method, path, data)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            queries_count = sum(
+                not query['sql'].startswith(TRANSACTION_STATEMENTS)
+                for query in queries.captured_queries
+            )
+
+        tracemalloc.start()
+        response = self.request(client, method, path, data)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            'method': method.upper(),
+            'path': path,
+            'status': response.status_code,
+            'p50_ms': (
+                round(percentile(timings, 50), 3) if timings else None
+            ),
+            'p95_ms': (
+                round(percentile(timings, 95), 3) if timings else None
+            ),
+            'p99_ms': (
+                round(percentile(timings, 99), 3) if timings else None
+            ),
+            'queries': queries_count,
+            'peak_memory_kb': round(peak_memory / 1024, 1),
+        }
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['username'])
+        token, _ = Token.objects.get_or_create(user=user)
+        client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+        endpoints = self.get_endpoints(user, options['password'])
+
+        with override_settings(
+            THROTTLE_ENABLED=False,
+            EXPENSIVE_CONCURRENCY_LIMIT=0
+        ):
+            report = {
+                'iterations': options['iterations'],
+                'username': user.username,
+                'recipes': Recipe.objects.count(),
+                'endpoints': {
+                    endpoint[0]: self.measure(
+                        client,
+                        endpoint,
+                        options['iterations'],
+                        options['warmup']
+                    )
+                    for endpoint in endpoints
+                },
+            }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,95 @@
+import json
+
+from django.core.management import BaseCommand
+
+from .benchmark_startup import Command as StartupCommand
+from .load_test import Command as LoadTestCommand
+
+STACKS = {
+    'wsgi': ('api_foodgram.wsgi:application', {}),
+    'asgi': (
+        'api_foodgram.asgi:application',
+        {'GUNICORN_WORKER_CLASS': 'uvicorn.workers.UvicornWorker'},
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность синхронного (WSGI, gthread) '
+        'и асинхронного (ASGI, uvicorn) запуска gunicorn при разном числе '
+        'одновременных соединений. Ограничения частоты на время замера '
+        'отключаются. Выводит отчёты load_test в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            action='append',
+            help='Путь запроса; несколько путей чередуются'
+        )
+        parser.add_argument('--token', help='Токен авторизации')
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            action='append',
+            help='Число соединений, по умолчанию 10, 50 и 200'
+        )
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--port', type=int, default=8766)
+        parser.add_argument('--timeout', type=float, default=60.0)
+        parser.add_argument(
+            '--stack',
+            action='append',
+            choices=tuple(STACKS),
+            help='Варианты запуска, по умолчанию оба'
+        )
+        parser.add_argument('--output', help='Файл для JSON-отчёта')
+
+    def measure(self, options, stack: str) -> dict:
+        app, env = STACKS[stack]
+        startup = StartupCommand()
+        load_test = LoadTestCommand()
+        url = f'http://127.0.0.1:{options["port"]}'
+        paths = options['path'] or ['/api/recipes/']
+        process = startup.start_server(options, True, app, {
+            **env,
+            'THROTTLE_ENABLED': 'False',
+            'EXPENSIVE_CONCURRENCY_LIMIT': '0',
+        })
+
+        try:
+            startup.wait_first_response(
+                process, url + paths[0], options['timeout']
+            )
+
+            return {
+                str(concurrency): load_test.run({
+                    'url': url,
+                    'path': paths,
+                    'method': 'GET',
+                    'data': None,
+                    'token': options['token'],
+                    'concurrency': concurrency,
+                    'requests': options['requests'],
+                    'timeout': options['timeout'],
+                })
+                for concurrency in options['concurrency'] or (10, 50, 200)
+            }
+        finally:
+            process.terminate()
+            process.wait(options['timeout'])
+
+    def handle(self, *args, **options):
+        report = {
+            stack: self.measure(options, stack)
+            for stack in options['stack'] or tuple(STACKS)
+        }
+        output = json.dumps(report, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
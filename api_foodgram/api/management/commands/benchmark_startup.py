@@ -0,0 +1,204 @@
+import json
+import os
+import signal
+import subprocess
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from .benchmark_api import percentile
+
+MEMORY_FIELDS = {
+    'Rss': 'rss_kb',
+    'Pss': 'pss_kb',
+    'Shared_Clean': 'shared_kb',
+    'Shared_Dirty': 'shared_kb',
+    'Private_Clean': 'private_kb',
+    'Private_Dirty': 'private_kb',
+}
+
+
+def get_memory(pid: int) -> dict:
+    """Память процесса в килобайтах из /proc/<pid>/smaps_rollup."""
+
+    memory = dict.fromkeys(MEMORY_FIELDS.values(), 0)
+
+    with open(f'/proc/{pid}/smaps_rollup', encoding='utf-8') as file:
+        for line in file:
+            name, _, value = line.partition(':')
+
+            if name in MEMORY_FIELDS:
+                memory[MEMORY_FIELDS[name]] += int(value.split()[0])
+
+    return memory
+
+
+def get_children(pid: int) -> list:
+    """Идентификаторы дочерних процессов."""
+
+    children = []
+
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+
+        try:
+            with open(f'/proc/{name}/stat', encoding='utf-8') as file:
+                stat = file.read()
+        except OSError:
+            continue
+
+        if int(stat.rsplit(')', 1)[1].split()[1]) == pid:
+            children.append(int(name))
+
+    return sorted(children)
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает gunicorn с gunicorn.conf.py с предзагрузкой и без неё '
+        'и выводит в JSON время до первого успешного ответа, задержки '
+        'первых запросов и память (RSS, PSS, общая и частная) мастера '
+        'и каждого воркера. Только Linux.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/recipes/')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Запросы после старта для замера прогретых воркеров'
+        )
+        parser.add_argument('--timeout', type=float, default=60.0)
+        parser.add_argument(
+            '--mode',
+            action='append',
+            choices=('preload', 'no-preload'),
+            help='Режимы запуска, по умолчанию оба'
+        )
+        parser.add_argument('--output', help='Файл для JSON-отчёта')
+
+    def start_server(
+        self,
+        options,
+        preload: bool,
+        app: str = 'api_foodgram.wsgi:application',
+        env: dict = None
+    ) -> subprocess.Popen:
+        env = {
+            **os.environ,
+            'GUNICORN_PRELOAD': str(preload),
+            'GUNICORN_WORKERS': str(options['workers']),
+            'GUNICORN_BIND': f'127.0.0.1:{options["port"]}',
+            **(env or {}),
+        }
+
+        return subprocess.Popen(
+            ['gunicorn', '-c', 'gunicorn.conf.py', app],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+
+    def request(self, url: str) -> int:
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+        except OSError:
+            return None
+
+    def wait_first_response(self, process, url, timeout) -> float:
+        """Ждёт первого ответа без ошибки сервера, возвращает
+        секунды от запуска.
+        """
+
+        started = time.perf_counter()
+
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise CommandError('gunicorn завершился при запуске.')
+
+            code = self.request(url)
+
+            if code is not None and code < 500:
+                return time.perf_counter() - started
+
+            time.sleep(0.01)
+
+        raise CommandError('gunicorn не ответил за отведённое время.')
+
+    def wait_workers(self, pid: int, count: int, timeout: float) -> list:
+        deadline = time.monotonic() + timeout
+
+        while time.monotonic() < deadline:
+            children = get_children(pid)
+
+            if len(children) >= count:
+                return children
+
+            time.sleep(0.05)
+
+        return get_children(pid)
+
+    def measure(self, options, preload: bool) -> dict:
+        url = f'http://127.0.0.1:{options["port"]}{options["path"]}'
+        process = self.start_server(options, preload)
+
+        try:
+            first = self.wait_first_response(
+                process, url, options['timeout']
+            )
+            timings = []
+
+            for _ in range(options['requests']):
+                started = time.perf_counter()
+                self.request(url)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            workers = self.wait_workers(
+                process.pid, options['workers'], options['timeout']
+            )
+            master = get_memory(process.pid)
+            memory = [get_memory(pid) for pid in workers]
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait(options['timeout'])
+
+        return {
+            'time_to_first_response_ms': round(first * 1000, 3),
+            'first_request_ms': round(timings[0], 3) if timings else None,
+            'p50_ms': round(percentile(timings, 50), 3) if timings else None,
+            'max_ms': round(max(timings), 3) if timings else None,
+            'master': master,
+            'workers': memory,
+            'workers_total': {
+                field: sum(worker[field] for worker in memory)
+                for field in master
+            },
+        }
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            raise CommandError('Нужен Linux с /proc/<pid>/smaps_rollup.')
+
+        report = {
+            mode: self.measure(options, mode == 'preload')
+            for mode in options['mode'] or ('preload', 'no-preload')
+        }
+        output = json.dumps(report, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
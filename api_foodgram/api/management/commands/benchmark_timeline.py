@@ -0,0 +1,229 @@
+import statistics
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from recipes.management.commands.generate_data import (SYNTHETIC_IMAGE,
+                                                       bulk_insert)
+from recipes.models import Recipe, TimelineEntry
+from services import timeline
+from users.models import CustomUser, Subscription
+
+
+def get_joined_page(user_id: int, before: int, limit: int) -> list:
+    """Страница ленты соединением подписок с рецептами при чтении."""
+
+    queryset = Recipe.objects.filter(
+        author_id__in=Subscription.objects.filter(
+            user_id=user_id
+        ).values('author_id')
+    )
+
+    if before is not None:
+        queryset = queryset.filter(id__lt=before)
+
+    return list(
+        queryset.order_by('-id').values_list('id', flat=True)[:limit]
+    )
+
+
+def measure(func, repeat: int) -> tuple:
+    """Медиана времени вызова в миллисекундах и последний результат."""
+
+    timings = []
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return statistics.median(timings), result
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает стоимость раскладки рецепта по лентам подписчиков '
+        'с подмешиванием при чтении и время чтения страниц ленты '
+        'с соединением подписок и рецептов. Данные создаются '
+        'во временной транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--followers',
+            type=int,
+            action='append',
+            help='Число подписчиков автора, по умолчанию 10, 100, 1000 '
+                 'и 10000'
+        )
+        parser.add_argument('--following', type=int, default=200)
+        parser.add_argument('--recipes-per-author', type=int, default=20)
+        parser.add_argument(
+            '--pull-share',
+            type=float,
+            default=0.1,
+            help='Доля авторов ленты, рецепты которых подмешиваются '
+                 'при чтении'
+        )
+        parser.add_argument('--pages', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--prefix', default='timeline_benchmark')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+
+        if CustomUser.objects.filter(
+            username__startswith=f'{prefix}_'
+        ).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {prefix} уже существуют.'
+            )
+
+        followers = options['followers'] or [10, 100, 1000, 10000]
+
+        with transaction.atomic():
+            user_ids = self.create_users(
+                options,
+                max(max(followers), options['following']) + len(followers)
+            )
+            self.measure_fan_out(options, user_ids, followers)
+            self.measure_reads(options, user_ids)
+            transaction.set_rollback(True)
+
+    def create_users(self, options, count: int) -> list:
+        prefix = options['prefix']
+        password = make_password(None)
+        bulk_insert(
+            CustomUser,
+            (
+                CustomUser(
+                    username=f'{prefix}_{number}',
+                    email=f'{prefix}_{number}@example.com',
+                    first_name='Имя',
+                    last_name=f'Фамилия {number}',
+                    password=password
+                )
+                for number in range(count)
+            ),
+            options['batch_size']
+        )
+
+        return list(
+            CustomUser.objects.filter(
+                username__startswith=f'{prefix}_'
+            ).order_by('id').values_list('id', flat=True)
+        )
+
+    def create_recipes(self, author_ids, count: int) -> list:
+        """Создаёт count рецептов каждому автору вперемешку по id."""
+
+        Recipe.objects.bulk_create(
+            Recipe(
+                name=f'Рецепт {number}',
+                text='Описание рецепта.',
+                image=SYNTHETIC_IMAGE,
+                cooking_time=10,
+                author_id=author_id
+            )
+            for number in range(count)
+            for author_id in author_ids
+        )
+
+        return list(
+            Recipe.objects.filter(author_id__in=author_ids).values_list(
+                'id', 'author_id'
+            )
+        )
+
+    def measure_fan_out(self, options, user_ids, followers) -> None:
+        self.stdout.write(
+            'Публикация рецепта: подписчиков, раскладка (мс), '
+            'подмешивание (мс), строк при раскладке'
+        )
+        authors = user_ids[-len(followers):]
+
+        for author_id, count in zip(authors, followers):
+            bulk_insert(
+                Subscription,
+                (
+                    Subscription(user_id=user_id, author_id=author_id)
+                    for user_id in user_ids[:count]
+                ),
+                options['batch_size']
+            )
+            [(recipe_id, _)] = self.create_recipes([author_id], 1)
+            entries = TimelineEntry.objects.filter(recipe_id=recipe_id)
+            timings, rows = {}, {}
+
+            for mode, threshold in (('push', count + 1), ('pull', count)):
+                with override_settings(TIMELINE_PULL_FOLLOWERS=threshold):
+                    started = time.perf_counter()
+                    timeline.fan_out_recipe(recipe_id)
+                    timings[mode] = (time.perf_counter() - started) * 1000
+
+                rows[mode] = entries.count()
+                entries.delete()
+
+            self.stdout.write(
+                f'{count}\t{timings["push"]:.2f}\t{timings["pull"]:.2f}'
+                f'\t{rows["push"]}'
+            )
+
+    def create_feed(self, options, reader_id, author_ids) -> None:
+        """Подписывает читателя на авторов и заполняет его ленту.
+        Доля pull_share авторов подмешивается при чтении.
+        """
+
+        pulled = set(author_ids[:int(len(author_ids) * options['pull_share'])])
+        Subscription.objects.bulk_create(
+            Subscription(user_id=reader_id, author_id=author_id)
+            for author_id in author_ids
+        )
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(author_id=author_id, recipe_id=recipe_id)
+                for recipe_id, author_id in self.create_recipes(
+                    author_ids, options['recipes_per_author']
+                )
+                if author_id in pulled
+            ),
+            batch_size=options['batch_size']
+        )
+
+        for author_id in set(author_ids) - pulled:
+            timeline.backfill_subscription(reader_id, author_id)
+
+    def measure_reads(self, options, user_ids) -> None:
+        reader_id = user_ids[-1]
+        author_ids = user_ids[:options['following']]
+        self.create_feed(options, reader_id, author_ids)
+        reader = CustomUser.objects.get(id=reader_id)
+        limit = options['page_size']
+        before = None
+        self.stdout.write(
+            f'Чтение ленты ({len(author_ids)} подписок): страница, '
+            'соединение (мс), лента (мс), совпадают'
+        )
+
+        for page in range(1, options['pages'] + 1):
+            joined_time, joined = measure(
+                lambda: get_joined_page(reader_id, before, limit),
+                options['repeat']
+            )
+            timeline_time, (ids, _) = measure(
+                lambda: timeline.get_timeline(reader, before, limit),
+                options['repeat']
+            )
+            self.stdout.write(
+                f'{page}\t{joined_time:.2f}\t{timeline_time:.2f}'
+                f'\t{"да" if ids == joined else "нет"}'
+            )
+
+            if not ids:
+                break
+
+            before = ids[-1]
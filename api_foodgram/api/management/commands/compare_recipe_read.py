@@ -0,0 +1,73 @@
+import time
+
+from api.representations import RECIPE_VALUES, get_recipes_representation
+from api.serializers import RecipeReadSerializer
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from services import recipes, users
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет побайтно JSON быстрого пути чтения рецептов с '
+        'RecipeReadSerializer и замеряет процессорное время на страницу'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=6)
+        parser.add_argument(
+            '--username',
+            help='Пользователь, от имени которого строятся ответы'
+        )
+
+    def handle(self, *args, **options):
+        request = APIRequestFactory().get('/api/recipes/')
+
+        if options['username']:
+            request.user = users.get_user_object(options['username'])
+        else:
+            request.user = AnonymousUser()
+
+        renderer = JSONRenderer()
+        queryset = recipes.get_all_recipes()
+        paginator = Paginator(queryset, options['page_size'])
+        serializer_time = fast_time = 0.0
+
+        for number in paginator.page_range:
+            page = paginator.page(number)
+
+            started = time.process_time()
+            expected = renderer.render(RecipeReadSerializer(
+                page.object_list,
+                many=True,
+                context={'request': request}
+            ).data)
+            serializer_time += time.process_time() - started
+
+            started = time.process_time()
+            actual = renderer.render(get_recipes_representation(
+                queryset.values(*RECIPE_VALUES)[
+                    page.start_index() - 1:page.end_index()
+                ],
+                request
+            ))
+            fast_time += time.process_time() - started
+
+            if actual != expected:
+                raise CommandError(
+                    f'Страница {number}: ответы различаются.\n'
+                    f'RecipeReadSerializer: {expected.decode()}\n'
+                    f'Быстрый путь: {actual.decode()}'
+                )
+
+        pages = paginator.num_pages or 1
+        self.stdout.write(
+            f'Страниц: {paginator.num_pages}, ответы совпадают.\n'
+            f'RecipeReadSerializer: {serializer_time / pages * 1000:.2f} '
+            f'мс CPU на страницу\n'
+            f'Быстрый путь: {fast_time / pages * 1000:.2f} '
+            f'мс CPU на страницу'
+        )
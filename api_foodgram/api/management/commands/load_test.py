@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+from django.core.management import BaseCommand
+
+from .benchmark_api import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный генератор: отправляет запросы к запущенному серверу '
+        'из нескольких потоков и выводит в JSON задержки, коды ответов '
+        'и Retry-After отклонённых запросов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument(
+            '--path',
+            action='append',
+            help='Путь запроса; несколько путей чередуются'
+        )
+        parser.add_argument('--method', default='GET')
+        parser.add_argument('--data', help='Тело запроса в JSON')
+        parser.add_argument('--token', help='Токен авторизации')
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=1000,
+            help='Общее число запросов'
+        )
+        parser.add_argument('--timeout', type=float, default=30.0)
+        parser.add_argument('--output', help='Файл для JSON-отчёта')
+
+    def build_request(self, options, index) -> urllib.request.Request:
+        paths = options['path'] or ['/api/recipes/']
+        headers = {'Content-Type': 'application/json'}
+
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+
+        return urllib.request.Request(
+            options['url'].rstrip('/') + paths[index % len(paths)],
+            data=options['data'].encode() if options['data'] else None,
+            headers=headers,
+            method=options['method'].upper()
+        )
+
+    def send(self, request, timeout) -> tuple:
+        """Отправляет запрос и возвращает код ответа и Retry-After."""
+
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                response.read()
+                return response.status, None
+        except urllib.error.HTTPError as error:
+            error.read()
+            return error.code, error.headers.get('Retry-After')
+        except OSError:
+            return 'error', None
+
+    def run(self, options) -> dict:
+        """Выполняет нагрузку и возвращает отчёт."""
+
+        lock = threading.Lock()
+        counter = iter(range(options['requests']))
+        timings = []
+        statuses = Counter()
+        retry_after = Counter()
+
+        def worker():
+            while True:
+                with lock:
+                    index = next(counter, None)
+
+                if index is None:
+                    return
+
+                request = self.build_request(options, index)
+                started = time.perf_counter()
+                code, wait = self.send(request, options['timeout'])
+                duration = time.perf_counter() - started
+
+                with lock:
+                    timings.append(duration * 1000)
+                    statuses[str(code)] += 1
+
+                    if wait is not None:
+                        retry_after[wait] += 1
+
+        threads = [
+            threading.Thread(target=worker)
+            for _ in range(options['concurrency'])
+        ]
+        started = time.perf_counter()
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        elapsed = time.perf_counter() - started
+
+        return {
+            'requests': len(timings),
+            'concurrency': options['concurrency'],
+            'elapsed_s': round(elapsed, 3),
+            'rps': round(len(timings) / elapsed, 1) if elapsed else None,
+            'statuses': dict(statuses),
+            'retry_after': dict(retry_after),
+            'p50_ms': (
+                round(percentile(timings, 50), 3) if timings else None
+            ),
+            'p95_ms': (
+                round(percentile(timings, 95), 3) if timings else None
+            ),
+            'p99_ms': (
+                round(percentile(timings, 99), 3) if timings else None
+            ),
+        }
+
+    def handle(self, *args, **options):
+        output = json.dumps(self.run(options), indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,229 @@
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+HELP = {
+    'foodgram_http_requests_total': 'Количество обработанных запросов.',
+    'foodgram_http_request_duration_seconds': 'Время обработки запроса.',
+    'foodgram_db_queries_per_request': 'Количество SQL-запросов на запрос.',
+    'foodgram_db_queries_total': 'Количество выполненных SQL-запросов.',
+    'foodgram_db_query_duration_seconds_total': 'Суммарное время SQL.',
+}
+
+
+class Registry:
+    """Счётчики и гистограммы процесса.
+
+    Каждый процесс gunicorn хранит свои значения и периодически
+    сбрасывает их в METRICS_DIR, откуда они суммируются при выдаче.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.flushed_at = 0.0
+
+    def inc(self, name: str, labels: dict, value: float = 1) -> None:
+        key = (name, tuple(sorted(labels.items())))
+
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(
+        self, name: str, labels: dict, value: float, buckets: tuple
+    ) -> None:
+        key = (name, tuple(sorted(labels.items())))
+
+        with self.lock:
+            histogram = self.histograms.get(key)
+
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    'buckets': list(buckets),
+                    'counts': [0] * len(buckets),
+                    'sum': 0,
+                    'count': 0,
+                }
+
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram['counts'][index] += 1
+
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def snapshot(self) -> dict:
+        """Возвращает значения процесса в виде, пригодном для JSON."""
+
+        with self.lock:
+            return {
+                'counters': [
+                    [name, list(labels), value]
+                    for (name, labels), value in self.counters.items()
+                ],
+                'histograms': [
+                    [name, list(labels), {
+                        'buckets': histogram['buckets'],
+                        'counts': list(histogram['counts']),
+                        'sum': histogram['sum'],
+                        'count': histogram['count'],
+                    }]
+                    for (name, labels), histogram in self.histograms.items()
+                ],
+            }
+
+    def flush(self, force: bool = False) -> None:
+        """Записывает значения процесса в METRICS_DIR."""
+
+        directory = settings.METRICS_DIR
+
+        if not directory:
+            return
+
+        now = time.monotonic()
+
+        with self.lock:
+            if (
+                not force
+                and now - self.flushed_at < settings.METRICS_FLUSH_INTERVAL
+            ):
+                return
+
+            self.flushed_at = now
+
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'metrics_{os.getpid()}.json')
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.snapshot(), file)
+
+        os.replace(tmp_path, path)
+
+
+registry = Registry()
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    """Увеличивает счётчик."""
+
+    registry.inc(name, labels, value)
+
+
+def observe(name: str, value: float, buckets: tuple, **labels) -> None:
+    """Добавляет наблюдение в гистограмму."""
+
+    registry.observe(name, labels, value, buckets)
+
+
+def collect_snapshots() -> list:
+    """Собирает значения всех процессов."""
+
+    directory = settings.METRICS_DIR
+
+    if not directory:
+        return [registry.snapshot()]
+
+    registry.flush(force=True)
+    snapshots = []
+
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.json'):
+            continue
+
+        try:
+            with open(
+                    os.path.join(directory, filename),
+                    encoding='utf-8'
+            ) as file:
+                snapshots.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+
+    return snapshots
+
+
+def format_labels(labels) -> str:
+    if not labels:
+        return ''
+
+    pairs = ','.join(
+        '{}="{}"'.format(
+            key,
+            str(value).replace('\\', r'\\').replace('"', r'\"')
+        )
+        for key, value in labels
+    )
+
+    return '{' + pairs + '}'
+
+
+def render() -> str:
+    """Возвращает сумму значений всех процессов
+    в текстовом формате Prometheus.
+    """
+
+    counters = {}
+    histograms = {}
+
+    for snapshot in collect_snapshots():
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+
+        for name, labels, histogram in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.setdefault(key, {
+                'buckets': histogram['buckets'],
+                'counts': [0] * len(histogram['buckets']),
+                'sum': 0,
+                'count': 0,
+            })
+            total['counts'] = [
+                left + right
+                for left, right in zip(total['counts'], histogram['counts'])
+            ]
+            total['sum'] += histogram['sum']
+            total['count'] += histogram['count']
+
+    lines = []
+    described = set()
+
+    def describe(name, metric_type):
+        if name not in described:
+            described.add(name)
+            lines.append(f'# HELP {name} {HELP.get(name, name)}')
+            lines.append(f'# TYPE {name} {metric_type}')
+
+    for (name, labels), value in sorted(counters.items()):
+        describe(name, 'counter')
+        lines.append(f'{name}{format_labels(labels)} {value}')
+
+    for (name, labels), histogram in sorted(histograms.items()):
+        describe(name, 'histogram')
+
+        for bound, count in zip(histogram['buckets'], histogram['counts']):
+            bucket_labels = labels + (('le', bound),)
+            lines.append(
+                f'{name}_bucket{format_labels(bucket_labels)} {count}'
+            )
+
+        inf_labels = labels + (('le', '+Inf'),)
+        lines.append(
+            f'{name}_bucket{format_labels(inf_labels)} {histogram["count"]}'
+        )
+        lines.append(f'{name}_sum{format_labels(labels)} {histogram["sum"]}')
+        lines.append(
+            f'{name}_count{format_labels(labels)} {histogram["count"]}'
+        )
+
+    return '\n'.join(lines) + '\n'
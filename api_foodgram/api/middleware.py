@@ -0,0 +1,285 @@
+import abc
+import asyncio
+import hashlib
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from api_foodgram.db_router import replica_reads
+
+from . import metrics, profiling
+
+query_stats = ContextVar('query_stats', default=None)
+
+
+def get_view_labels(request) -> dict:
+    """Возвращает имя вьюхи и действие, обработавших запрос."""
+
+    match = getattr(request, 'resolver_match', None)
+
+    if match is None:
+        return {'view': 'unresolved', 'action': ''}
+
+    view = getattr(match.func, 'cls', None) or getattr(
+        match.func, 'view_class', None
+    )
+    actions = getattr(match.func, 'actions', None) or {}
+    method = request.method.lower()
+
+    return {
+        'view': view.__name__ if view else match.func.__name__,
+        'action': actions.get(method, method),
+    }
+
+
+class QueryStats:
+    """Обёртка execute_wrapper, считающая SQL-запросы и их время."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+def count_queries(execute, sql, params, many, context):
+    """Передаёт запрос в QueryStats текущего контекста, если он есть.
+
+    Контекст копируется в потоки sync_to_async, поэтому запросы
+    синхронных вьюх под ASGI считаются в любом потоке.
+    """
+
+    stats = query_stats.get()
+
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    return stats(execute, sql, params, many, context)
+
+
+class HybridMiddleware(metaclass=abc.ABCMeta):
+    """Основа middleware, работающих и под WSGI, и под ASGI.
+
+    Под ASGI Django передаёт асинхронный get_response, и вызов
+    уходит в acall, иначе цепочка с асинхронными вьюхами
+    переводилась бы в синхронный режим. Наследник реализует оба
+    метода.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.acall(request)
+
+        return self.call(request)
+
+    @abc.abstractmethod
+    def call(self, request):
+        """Обработка запроса под WSGI."""
+
+    @abc.abstractmethod
+    async def acall(self, request):
+        """Обработка запроса под ASGI."""
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """Собирает время ответа, количество и время SQL-запросов
+    для каждой пары вьюха/действие.
+
+    Запросы считает count_queries по QueryStats в query_stats,
+    под ASGI — и в потоках, где выполняются синхронные вьюхи.
+    """
+
+    def call(self, request):
+        stats = QueryStats()
+        started = time.perf_counter()
+        token = query_stats.set(stats)
+
+        try:
+            response = self.get_response(request)
+        finally:
+            query_stats.reset(token)
+
+        self.observe(request, response, stats, started)
+
+        return response
+
+    async def acall(self, request):
+        stats = QueryStats()
+        started = time.perf_counter()
+        token = query_stats.set(stats)
+
+        try:
+            response = await self.get_response(request)
+        finally:
+            query_stats.reset(token)
+
+        self.observe(request, response, stats, started)
+
+        return response
+
+    def observe(self, request, response, stats, started) -> None:
+        duration = time.perf_counter() - started
+        labels = get_view_labels(request)
+
+        metrics.inc(
+            'foodgram_http_requests_total',
+            method=request.method,
+            status=str(response.status_code),
+            **labels
+        )
+        metrics.observe(
+            'foodgram_http_request_duration_seconds',
+            duration,
+            metrics.LATENCY_BUCKETS,
+            **labels
+        )
+        metrics.observe(
+            'foodgram_db_queries_per_request',
+            stats.count,
+            metrics.QUERIES_BUCKETS,
+            **labels
+        )
+        metrics.inc('foodgram_db_queries_total', stats.count, **labels)
+        metrics.inc(
+            'foodgram_db_query_duration_seconds_total',
+            stats.duration,
+            **labels
+        )
+        metrics.registry.flush()
+
+
+class ReplicaPinningMiddleware(HybridMiddleware):
+    """Разрешает чтение с реплик для безопасных запросов.
+
+    После изменяющего запроса клиент на REPLICA_PIN_SECONDS
+    закрепляется за основной БД, чтобы видеть свои изменения:
+    по cookie и по отпечатку заголовка Authorization в общем кеше
+    REPLICA_PIN_CACHE. Без общего кеша запросы с Authorization
+    всегда читают из основной БД: закрепление в кеше процесса
+    не видно другим воркерам.
+    """
+
+    cookie_name = 'db_primary_pin'
+
+    @property
+    def pin_cache(self):
+        alias = settings.REPLICA_PIN_CACHE
+        return caches[alias] if alias else None
+
+    def get_pin_key(self, request) -> str:
+        authorization = request.headers.get('Authorization')
+
+        if not authorization:
+            return None
+
+        digest = hashlib.sha256(authorization.encode()).hexdigest()
+
+        return f'db_primary_pin:{digest}'
+
+    def is_pinned(self, request) -> bool:
+        if self.cookie_name in request.COOKIES:
+            return True
+
+        pin_key = self.get_pin_key(request)
+
+        if pin_key is None:
+            return False
+
+        if self.pin_cache is None:
+            return True
+
+        return self.pin_cache.get(pin_key) is not None
+
+    def is_safe(self, request) -> bool:
+        return request.method in ('GET', 'HEAD', 'OPTIONS')
+
+    def call(self, request):
+        is_safe = self.is_safe(request)
+        token = replica_reads.set(is_safe and not self.is_pinned(request))
+
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+
+        if not is_safe:
+            self.pin(request, response)
+
+        return response
+
+    async def acall(self, request):
+        is_safe = self.is_safe(request)
+        token = replica_reads.set(
+            is_safe and not await sync_to_async(self.is_pinned)(request)
+        )
+
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+
+        if not is_safe:
+            await sync_to_async(self.pin)(request, response)
+
+        return response
+
+    def pin(self, request, response) -> None:
+        """Закрепляет клиента за основной БД после успешного изменения."""
+
+        if response.status_code < 400:
+            seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                self.cookie_name, '1', max_age=seconds, httponly=True
+            )
+            pin_key = self.get_pin_key(request)
+
+            if pin_key is not None and self.pin_cache is not None:
+                self.pin_cache.set(pin_key, 1, seconds)
+
+
+class ProfilingMiddleware(HybridMiddleware):
+    """Профилирует запрос сотрудника с заголовком X-Profile
+    или параметром profile=1 и сохраняет результат в PROFILE_DIR.
+
+    Без переключателя стоимость — проверка заголовка и параметра.
+    Под ASGI профилируемый запрос выполняется в отдельном потоке
+    вместе с вьюхой, см. profiling.profile_request.
+    """
+
+    async def acall(self, request):
+        if profiling.is_requested(request) and await sync_to_async(
+            profiling.is_staff
+        )(request):
+            return await sync_to_async(profiling.profile_request)(
+                request, async_to_sync(self.get_response), get_view_labels
+            )
+
+        return await self.get_response(request)
+
+    def call(self, request):
+        if profiling.is_requested(request) and profiling.is_staff(request):
+            return profiling.profile_request(
+                request, self.get_response, get_view_labels
+            )
+
+        return self.get_response(request)
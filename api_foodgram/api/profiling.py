@@ -0,0 +1,226 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+# Запрос профилируется: под ASGI вьюхи выполняются в потоке профиля.
+profiling_active = ContextVar('profiling_active', default=False)
+
+
+def is_requested(request) -> bool:
+    """Проверяет переключатель профилирования без аутентификации:
+    заголовок X-Profile или параметр profile=1.
+    """
+
+    if not settings.PROFILE_DIR:
+        return False
+
+    return (
+        PROFILE_HEADER in request.META
+        or request.GET.get('profile') == '1'
+    )
+
+
+def is_staff(request) -> bool:
+    """Проверяет, что запрос сделан сотрудником: по сессии
+    или по классам аутентификации DRF.
+    """
+
+    user = getattr(request, 'user', None)
+
+    if user is not None and user.is_staff:
+        return True
+
+    drf_request = Request(
+        request,
+        authenticators=[
+            auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ]
+    )
+
+    try:
+        return drf_request.user.is_staff
+    except Exception:
+        return False
+
+
+class SqlRecorder:
+    """Обёртка execute_wrapper, запоминающая SQL и его время."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'duration_ms': round(
+                    (time.perf_counter() - started) * 1000, 3
+                ),
+            })
+
+
+def get_label(function) -> str:
+    filename, line, name = function
+    return f'{name} ({os.path.basename(filename)}:{line})'
+
+
+def get_collapsed_stacks(stats: pstats.Stats) -> str:
+    """Раскладывает граф вызовов cProfile в стеки формата collapsed
+    (flamegraph.pl, speedscope) с весом в микросекундах.
+
+    Время функции делится между её вызывающими пропорционально
+    накопленному времени на каждом ребре графа. Ветви короче
+    микросекунды отбрасываются.
+    """
+
+    children = {}
+
+    for function, (*_, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            children.setdefault(caller, {})[function] = edge[3]
+
+    stacks = Counter()
+
+    def walk(path, function, cumulative):
+        _, _, total_time, function_cumulative, _ = stats.stats[function]
+        share = cumulative / function_cumulative if function_cumulative else 0
+        path = path + (function,)
+        stacks[';'.join(map(get_label, path))] += total_time * share
+
+        for child, edge_cumulative in children.get(function, {}).items():
+            if child not in path and edge_cumulative * share >= 0.000_001:
+                walk(path, child, edge_cumulative * share)
+
+    for function, (*_, cumulative, callers) in stats.stats.items():
+        if not callers:
+            walk((), function, cumulative)
+
+    return ''.join(
+        f'{stack} {round(seconds * 1_000_000)}\n'
+        for stack, seconds in stacks.items()
+        if seconds >= 0.000_000_5
+    )
+
+
+def get_top_functions(stats: pstats.Stats, limit: int) -> list:
+    """Возвращает самые затратные функции по накопленному времени."""
+
+    rows = sorted(
+        stats.stats.items(), key=lambda item: item[1][3], reverse=True
+    )
+
+    return [
+        {
+            'function': get_label(function),
+            'calls': calls,
+            'total_ms': round(total_time * 1000, 3),
+            'cumulative_ms': round(cumulative_time * 1000, 3),
+        }
+        for function, (_, calls, total_time, cumulative_time, _)
+        in rows[:limit]
+    ]
+
+
+def write_entry(profile_id: str, collapsed: str, summary: dict) -> None:
+    """Записывает профиль в PROFILE_DIR и удаляет старейшие записи
+    сверх PROFILE_MAX_ENTRIES.
+    """
+
+    directory = settings.PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+
+    for extension, content in (
+        ('folded', collapsed),
+        ('json', json.dumps(summary, ensure_ascii=False, indent=2)),
+    ):
+        path = os.path.join(directory, f'{profile_id}.{extension}')
+        temporary = f'{path}.tmp'
+
+        with open(temporary, 'w', encoding='utf-8') as file:
+            file.write(content)
+
+        os.replace(temporary, path)
+
+    entries = sorted(
+        name[:-len('.json')]
+        for name in os.listdir(directory)
+        if name.endswith('.json')
+    )
+
+    for stale in entries[:-settings.PROFILE_MAX_ENTRIES]:
+        for extension in ('folded', 'json'):
+            try:
+                os.remove(os.path.join(directory, f'{stale}.{extension}'))
+            except FileNotFoundError:
+                pass
+
+
+def profile_request(request, get_response, labels_getter):
+    """Выполняет запрос под cProfile, записывая SQL
+    с временем выполнения.
+
+    cProfile видит только текущий поток, поэтому под ASGI get_response
+    передаётся через async_to_sync: синхронные вьюхи Django и вьюхи
+    из async_views выполняются в этом же потоке.
+    """
+
+    recorder = SqlRecorder()
+    profile = cProfile.Profile()
+    started = time.perf_counter()
+    token = profiling_active.set(True)
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+
+        profile.enable()
+
+        try:
+            response = get_response(request)
+        finally:
+            profile.disable()
+            profiling_active.reset(token)
+
+    duration = time.perf_counter() - started
+    stats = pstats.Stats(profile, stream=io.StringIO())
+    profile_id = f'{time.time_ns()}_{os.getpid()}'
+    summary = {
+        'id': profile_id,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 3),
+        **labels_getter(request),
+        'sql': {
+            'count': len(recorder.queries),
+            'duration_ms': round(
+                sum(query['duration_ms'] for query in recorder.queries), 3
+            ),
+            'queries': recorder.queries,
+        },
+        'top_functions': get_top_functions(
+            stats, settings.PROFILE_TOP_FUNCTIONS
+        ),
+    }
+    write_entry(profile_id, get_collapsed_stacks(stats), summary)
+    response['X-Profile-Id'] = profile_id
+
+    return response
@@ -0,0 +1,139 @@
+import logging
+import os
+import sys
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.HELP['foodgram_query_budget_exceeded_total'] = (
+    'Количество запросов, превысивших бюджет SQL-запросов.'
+)
+
+
+class QueryBudgetExceededError(Exception):
+    """Вьюха выполнила больше SQL-запросов, чем разрешено бюджетом."""
+
+
+def get_call_site() -> str:
+    """Возвращает первую строку кода проекта, вызвавшую SQL-запрос.
+    Кадры обёрток execute_wrapper лежат глубже слоя django.db
+    и пропускаются.
+    """
+
+    base_dir = str(settings.BASE_DIR)
+    frame = sys._getframe(1)
+    passed_db_layer = False
+
+    while frame is not None:
+        filename = frame.f_code.co_filename
+
+        if os.path.join('django', 'db', '') in filename:
+            passed_db_layer = True
+        elif (
+            passed_db_layer
+            and filename.startswith(base_dir)
+            and 'site-packages' not in filename
+        ):
+            return (
+                f'{filename[len(base_dir) + 1:]}:{frame.f_lineno} '
+                f'in {frame.f_code.co_name}'
+            )
+
+        frame = frame.f_back
+
+    return 'unknown'
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper, считающая запросы.
+    При with_sql запоминает SQL и место вызова.
+    """
+
+    def __init__(self, with_sql: bool):
+        self.with_sql = with_sql
+        self.count = 0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+
+        if self.with_sql:
+            self.queries.append((get_call_site(), sql))
+
+        return execute(sql, params, many, context)
+
+    def report(self) -> str:
+        """Группирует запросы по месту вызова."""
+
+        call_sites = Counter(call_site for call_site, _ in self.queries)
+        examples = dict(reversed(self.queries))
+
+        return '\n'.join(
+            f'  {count} × {call_site}\n    {examples[call_site]}'
+            for call_site, count in call_sites.most_common()
+        )
+
+
+class QueryBudgetMixin:
+    """Ограничивает количество SQL-запросов для действий вьюсета.
+
+    Бюджет задаётся в query_budgets как {действие: число запросов}
+    и не зависит от размера страницы. Режим QUERY_BUDGET_MODE:
+    raise — исключение, log — предупреждение в лог,
+    metric — только счётчик в метриках, off — без проверки.
+    """
+
+    query_budgets = {}
+
+    def dispatch(self, request, *args, **kwargs):
+        action = getattr(self, 'action_map', {}).get(request.method.lower())
+        budget = self.query_budgets.get(action)
+        mode = settings.QUERY_BUDGET_MODE
+
+        if budget is None or mode == 'off':
+            return super().dispatch(request, *args, **kwargs)
+
+        recorder = QueryRecorder(with_sql=mode in ('raise', 'log'))
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+
+            response = super().dispatch(request, *args, **kwargs)
+
+        return self.check_query_budget(response, action, budget, recorder)
+
+    def check_query_budget(self, response, action, budget, recorder):
+        """Сообщает о превышении бюджета согласно QUERY_BUDGET_MODE."""
+
+        if recorder.count <= budget:
+            return response
+
+        mode = settings.QUERY_BUDGET_MODE
+        view = type(self).__name__
+        metrics.inc(
+            'foodgram_query_budget_exceeded_total',
+            view=view,
+            action=action
+        )
+
+        if mode == 'metric':
+            return response
+
+        message = (
+            f'{view}.{action}: {recorder.count} SQL-запросов '
+            f'при бюджете {budget}.\n{recorder.report()}'
+        )
+
+        if mode == 'raise':
+            raise QueryBudgetExceededError(message)
+
+        logger.warning(message)
+
+        return response
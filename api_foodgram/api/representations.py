@@ -0,0 +1,129 @@
+from recipes.models import Favorite, IngredientInRecipe, Recipe, ShoppingCart
+from users.models import CustomUser, Subscription
+
+RECIPE_VALUES = ('id', 'name', 'image', 'text', 'cooking_time', 'author_id')
+
+
+def get_image_url(name: str, request) -> str:
+    """Возвращает абсолютную ссылку на изображение, как ImageField DRF."""
+
+    if not name:
+        return None
+
+    url = Recipe._meta.get_field('image').storage.url(name)
+
+    if request is None:
+        return url
+
+    return request.build_absolute_uri(url)
+
+
+def group_by_recipe(rows, build) -> dict:
+    """Группирует строки выборки по первому элементу (id рецепта)."""
+
+    grouped = {}
+
+    for row in rows:
+        grouped.setdefault(row[0], []).append(build(row))
+
+    return grouped
+
+
+def get_user_recipe_ids(model, user, recipe_ids) -> set:
+    """Возвращает id рецептов из списка избранного или покупок."""
+
+    if user is None or user.is_anonymous:
+        return set()
+
+    return set(
+        model.objects.filter(
+            user=user,
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True)
+    )
+
+
+def get_recipes_representation(rows, request) -> list:
+    """Собирает представление рецептов из строк .values()
+    без ModelSerializer. Результат совпадает с RecipeReadSerializer.
+    """
+
+    rows = list(rows)
+    recipe_ids = [row['id'] for row in rows]
+    author_ids = {row['author_id'] for row in rows}
+    user = getattr(request, 'user', None)
+
+    tags = {}
+    recipe_tags = group_by_recipe(
+        Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('tag_id').values_list(
+            'recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug'
+        ),
+        lambda row: tags.setdefault(row[1], {
+            'id': row[1],
+            'name': row[2],
+            'color': row[3],
+            'slug': row[4],
+        })
+    )
+    recipe_ingredients = group_by_recipe(
+        IngredientInRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('id').values_list(
+            'recipe_id',
+            'ingredient_id',
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            'amount'
+        ),
+        lambda row: {
+            'id': row[1],
+            'name': row[2],
+            'measurement_unit': row[3],
+            'amount': row[4],
+        }
+    )
+
+    subscribed = set()
+
+    if user is not None and not user.is_anonymous:
+        subscribed = set(
+            Subscription.objects.filter(
+                user=user,
+                author_id__in=author_ids
+            ).values_list('author_id', flat=True)
+        )
+
+    authors = {
+        author_id: {
+            'email': email,
+            'id': author_id,
+            'username': username,
+            'first_name': first_name,
+            'last_name': last_name,
+            'is_subscribed': author_id in subscribed,
+        }
+        for author_id, email, username, first_name, last_name
+        in CustomUser.objects.filter(id__in=author_ids).values_list(
+            'id', 'email', 'username', 'first_name', 'last_name'
+        )
+    }
+    favorited = get_user_recipe_ids(Favorite, user, recipe_ids)
+    in_shopping_cart = get_user_recipe_ids(ShoppingCart, user, recipe_ids)
+
+    return [
+        {
+            'id': row['id'],
+            'tags': recipe_tags.get(row['id'], []),
+            'author': authors[row['author_id']],
+            'ingredients': recipe_ingredients.get(row['id'], []),
+            'is_favorited': row['id'] in favorited,
+            'is_in_shopping_cart': row['id'] in in_shopping_cart,
+            'name': row['name'],
+            'image': get_image_url(row['image'], request),
+            'text': row['text'],
+            'cooking_time': row['cooking_time'],
+        }
+        for row in rows
+    ]
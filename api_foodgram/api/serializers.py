@@ -1,16 +1,22 @@
 import base64
 import uuid
 
-from django.core.exceptions import ObjectDoesNotExist
+from django.conf import settings
 from django.core.files.base import ContentFile
 from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
                             ShoppingCart, Tag)
 from rest_framework import serializers
-from services import recipes, tags
+from services import changes, recipes, similarity, tags, timeline
 from users.models import CustomUser, Subscription
 
+from . import metrics
+
+metrics.HELP['foodgram_serializer_memo_total'] = (
+    'Обращения к памяти представлений вложенных объектов в запросе.'
+)
+
 
 class IngredientSerializer(serializers.ModelSerializer):
     """Обработчик ингредиентов."""
@@ -44,7 +50,50 @@ class IngredientInRecipeCreateSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class TagSerializer(serializers.ModelSerializer):
+class MemoizedRepresentationMixin:
+    """Сериализует каждый объект не больше одного раза за запрос.
+
+    Представление запоминается на запросе по классу сериализатора
+    и первичному ключу и переиспользуется для повторных авторов
+    и тегов. Работает только для безопасных методов, чтобы не отдать
+    представление объекта до его изменения.
+    """
+
+    def to_representation(self, instance):
+        request = self.context.get('request')
+        pk = getattr(instance, 'pk', None)
+
+        if (
+            request is None
+            or pk is None
+            or request.method not in ('GET', 'HEAD')
+        ):
+            return super().to_representation(instance)
+
+        http_request = getattr(request, '_request', request)
+        memo = http_request.__dict__.setdefault('representation_memo', {})
+        key = (type(self), pk)
+        serializer = type(self).__name__
+
+        if key in memo:
+            metrics.inc(
+                'foodgram_serializer_memo_total',
+                serializer=serializer,
+                result='hit'
+            )
+            return memo[key]
+
+        metrics.inc(
+            'foodgram_serializer_memo_total',
+            serializer=serializer,
+            result='miss'
+        )
+        memo[key] = super().to_representation(instance)
+
+        return memo[key]
+
+
+class TagSerializer(MemoizedRepresentationMixin, serializers.ModelSerializer):
     """Обработчик тегов."""
 
     class Meta:
@@ -85,6 +134,15 @@ class RecipeInSubscriptionSerializer(serializers.ModelSerializer):
         )
 
 
+class SimilarRecipeSerializer(RecipeInSubscriptionSerializer):
+    """Обработчик выдачи похожих рецептов."""
+
+    similarity = serializers.FloatField(source='score', read_only=True)
+
+    class Meta(RecipeInSubscriptionSerializer.Meta):
+        fields = RecipeInSubscriptionSerializer.Meta.fields + ('similarity',)
+
+
 class UsernameValidateSerializer:
     """Обработчик проверяет поле username на различие с me."""
 
@@ -96,7 +154,11 @@ class UsernameValidateSerializer:
         return value
 
 
-class CustomUserSerializer(UsernameValidateSerializer, UserSerializer):
+class CustomUserSerializer(
+    MemoizedRepresentationMixin,
+    UsernameValidateSerializer,
+    UserSerializer
+):
     """Обработчик пользователей для модели CustomUser."""
 
     is_subscribed = serializers.SerializerMethodField()
@@ -117,6 +179,9 @@ class CustomUserSerializer(UsernameValidateSerializer, UserSerializer):
         текущий пользователь на автора рецепта.
         """
 
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+
         user = self.context.get('request').user
 
         if user.is_anonymous:
@@ -167,6 +232,9 @@ class SubscriptionSerializer(CustomUserSerializer):
     def get_recipes_count(self, obj) -> int:
         """Метод, считающий общее количество рецептов пользователя."""
 
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
+
         return obj.recipes.count()
 
     def get_recipes(self, obj):
@@ -209,10 +277,49 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'text',
             'cooking_time'
         )
+        expandable_fields = ('tags', 'author', 'ingredients')
+
+    def __init__(self, *args, **kwargs):
+        """Оставляет только поля из контекста fields.
+        Связи, не указанные в expand, выводятся первичными ключами.
+        """
+
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+
+        if fields is None:
+            return
+
+        expand = self.context.get('expand', set())
+
+        for name in set(self.fields) - fields - expand:
+            self.fields.pop(name)
+
+        collapsed = {
+            'tags': lambda: serializers.PrimaryKeyRelatedField(
+                many=True, read_only=True
+            ),
+            'author': lambda: serializers.PrimaryKeyRelatedField(
+                read_only=True
+            ),
+            'ingredients': lambda: serializers.SlugRelatedField(
+                many=True,
+                read_only=True,
+                slug_field='ingredient_id',
+                source='ingredientinrecipe_set'
+            ),
+        }
+
+        for name, field in collapsed.items():
+            if name in self.fields and name not in expand:
+                self.fields[name] = field()
 
     def get_is_favorited(self, obj) -> bool:
         """Метод проверки добавления рецепта в избранное."""
 
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+
         request = self.context.get('request')
 
         if request is None or request.user.is_anonymous:
@@ -226,6 +333,9 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     def get_is_in_shopping_cart(self, obj) -> bool:
         """Метод проверки добавления рецепта в корзину."""
 
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+
         request = self.context.get('request')
 
         if request is None or request.user.is_anonymous:
@@ -267,27 +377,30 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                 'ingredients': 'Необходим хотя бы один ингредиент.'
             })
 
-        ingredients_list = []
-
-        for item in value:
-            try:
-                ingredient = Ingredient.objects.get(id=item['id'])
-
-                if ingredient in ingredients_list:
-                    raise serializers.ValidationError({
-                        'ingredients':
-                            'Рецепт содержит повторяющиеся ингредиенты.'
-                    })
-
-                ingredients_list.append(ingredient)
+        ingredient_ids = [item['id'] for item in value]
+        existing_ids = set(
+            Ingredient.objects.filter(
+                id__in=ingredient_ids
+            ).values_list('id', flat=True)
+        )
+        ingredients_list = set()
 
-            except ObjectDoesNotExist:
+        for ingredient_id in ingredient_ids:
+            if ingredient_id not in existing_ids:
                 raise serializers.ValidationError({
                     'ingredients':
                         'При создании рецепта указан '
                         'несуществующий ингридиент.'
                 })
 
+            if ingredient_id in ingredients_list:
+                raise serializers.ValidationError({
+                    'ingredients':
+                        'Рецепт содержит повторяющиеся ингредиенты.'
+                })
+
+            ingredients_list.add(ingredient_id)
+
         return value
 
     def validate_tags(self, value):
@@ -317,10 +430,12 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
         return serializer.data
 
-    def create_ingredients(self, ingredients, recipe) -> None:
-        """Метод добавления ингредиента."""
+    def create_ingredients(self, ingredients, recipe) -> list:
+        """Метод добавления ингредиента.
+        Возвращает пары (id ингредиента, количество).
+        """
 
-        IngredientInRecipe.objects.bulk_create(
+        ingredients_in_recipe = IngredientInRecipe.objects.bulk_create(
             [
                 IngredientInRecipe(
                     ingredient_id=elem.get('id'),
@@ -331,6 +446,11 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             ]
         )
 
+        return [
+            (ingredient.ingredient_id, ingredient.amount)
+            for ingredient in ingredients_in_recipe
+        ]
+
     def create_tags(self, tags, recipe) -> None:
         """Метод добавления тега."""
 
@@ -347,18 +467,32 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data, author=user)
 
         self.create_tags(tags, recipe)
-        self.create_ingredients(ingredients, recipe)
+        changes.record_recipe_upsert(
+            recipe, self.create_ingredients(ingredients, recipe)
+        )
+        similarity.schedule_recipe_update(recipe.id)
+        timeline.schedule_fan_out(recipe.id)
 
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
+        ingredients, removed = [], set()
+
         if 'ingredients' in validated_data:
             ingredients_for_recipe = validated_data.pop('ingredients')
-            IngredientInRecipe.objects.filter(recipe=instance).delete()
-            self.create_ingredients(
+            old_ingredients = IngredientInRecipe.objects.filter(
+                recipe=instance
+            )
+            removed = set(
+                old_ingredients.values_list('ingredient_id', flat=True)
+            )
+            old_ingredients.delete()
+            ingredients = self.create_ingredients(
                 recipe=instance, ingredients=ingredients_for_recipe
             )
+            removed -= {ingredient_id for ingredient_id, _ in ingredients}
+            similarity.schedule_recipe_update(instance.id)
 
         if 'tags' in validated_data:
             tags = validated_data.pop('tags')
@@ -368,9 +502,45 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
 
         instance.save()
+        changes.record_recipe_upsert(instance, ingredients, removed)
+
         return instance
 
 
+class MealPlanItemSerializer(serializers.Serializer):
+    """Обработчик рецепта в плане питания."""
+
+    id = serializers.IntegerField(min_value=1)
+    amount = serializers.IntegerField(min_value=1, default=1)
+
+
+class MealPlanSerializer(serializers.Serializer):
+    """Обработчик плана питания: рецепты с множителями."""
+
+    recipes = MealPlanItemSerializer(many=True)
+
+    def validate_recipes(self, value) -> dict:
+        """Метод сведения плана в {id рецепта: множитель}."""
+
+        if not value:
+            raise serializers.ValidationError(
+                'Необходим хотя бы один рецепт.'
+            )
+
+        if len(value) > settings.MEAL_PLAN_MAX_RECIPES:
+            raise serializers.ValidationError(
+                'В плане не может быть больше '
+                f'{settings.MEAL_PLAN_MAX_RECIPES} рецептов.'
+            )
+
+        plan = {}
+
+        for item in value:
+            plan[item['id']] = plan.get(item['id'], 0) + item['amount']
+
+        return plan
+
+
 class FavoriteSerializer(serializers.ModelSerializer):
     """Обработчик добавления рецепта в список избранного."""
 
@@ -0,0 +1,128 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from rest_framework.authtoken.models import Token
+from services.meal_plan import invalidate_ingredient_vector
+from users.models import CustomUser
+
+from . import edge_cache
+from .authentication import token_cache
+from .catalog import bump_catalog_version
+from .middleware import count_queries
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    """Подключает подсчёт SQL-запросов для метрик к новому
+    соединению с БД.
+    """
+
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_queries)
+
+
+@receiver(post_delete, sender=Token)
+def revoke_deleted_token(sender, instance, **kwargs):
+    """Отзывает токен из кеша при выходе пользователя."""
+
+    transaction.on_commit(lambda: token_cache.revoke(
+        keys=[instance.key], user_id=instance.user_id
+    ))
+
+
+# Поля пользователя, от которых зависит вход по токену.
+AUTH_FIELDS = ('password', 'is_active')
+
+
+@receiver(pre_save, sender=CustomUser)
+def detect_auth_change(sender, instance, update_fields=None, **kwargs):
+    """Отмечает, меняются ли при сохранении пароль или активность
+    пользователя. Сохранение только last_login при входе
+    БД не читает.
+    """
+
+    if instance.pk is None or (
+        update_fields is not None
+        and not set(AUTH_FIELDS) & set(update_fields)
+    ):
+        instance._auth_changed = False
+        return
+
+    saved = CustomUser.objects.filter(
+        pk=instance.pk
+    ).values_list(*AUTH_FIELDS).first()
+    instance._auth_changed = saved != tuple(
+        getattr(instance, field) for field in AUTH_FIELDS
+    )
+
+
+@receiver(post_save, sender=CustomUser)
+def revoke_user_tokens(sender, instance, created, **kwargs):
+    """Отзывает токены пользователя при смене пароля
+    или деактивации. Остальные поля в кеше токенов обновятся
+    через TOKEN_AUTH_CACHE_TTL.
+    """
+
+    if created or not instance._auth_changed:
+        return
+
+    keys = list(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
+    transaction.on_commit(
+        lambda: token_cache.revoke(keys=keys, user_id=instance.pk)
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_catalog(sender, **kwargs):
+    """Пересобирает снимок каталога при изменении ингредиентов."""
+
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_vector(sender, instance, **kwargs):
+    """Сбрасывает вектор ингредиентов изменённого рецепта."""
+
+    transaction.on_commit(lambda: invalidate_ingredient_vector(instance.pk))
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def invalidate_ingredient_in_recipe_vector(sender, instance, **kwargs):
+    """Сбрасывает вектор ингредиентов рецепта при изменении состава."""
+
+    transaction.on_commit(
+        lambda: invalidate_ingredient_vector(instance.recipe_id)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def refresh_recipe_edge_cache(sender, instance, **kwargs):
+    """Обновляет в кеше nginx ответы с изменённым рецептом."""
+
+    edge_cache.schedule_refresh(edge_cache.get_recipe_paths(instance.pk))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def refresh_tag_edge_cache(sender, instance, **kwargs):
+    """Обновляет в кеше nginx ответы с изменённым тегом."""
+
+    edge_cache.schedule_refresh(edge_cache.get_tag_paths(instance.pk))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def refresh_ingredient_edge_cache(sender, instance, **kwargs):
+    """Обновляет в кеше nginx ответы с изменённым ингредиентом."""
+
+    edge_cache.schedule_refresh(
+        edge_cache.get_ingredient_paths(instance.pk)
+    )
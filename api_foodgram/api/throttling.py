@@ -0,0 +1,194 @@
+import abc
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.throttling import BaseThrottle
+
+from . import metrics
+
+metrics.HELP['foodgram_throttled_requests_total'] = (
+    'Запросы, отклонённые ограничением частоты или нагрузки.'
+)
+
+INFLIGHT_KEY = 'throttle:inflight'
+
+
+def get_throttle_cache():
+    return caches[settings.THROTTLE_CACHE]
+
+
+def get_action_cost(view) -> int:
+    """Стоимость действия вьюхи в жетонах, по умолчанию 1."""
+
+    costs = getattr(view, 'throttle_costs', {})
+
+    return costs.get(getattr(view, 'action', None), 1)
+
+
+def add_spent(cache, key: str, cost: int, timeout: float) -> int:
+    """Атомарно прибавляет cost к счётчику и возвращает новое значение."""
+
+    cache.add(key, 0, timeout)
+
+    try:
+        return cache.incr(key, cost)
+    except ValueError:
+        cache.set(key, cost, timeout)
+
+        return cost
+
+
+class TokenBucketThrottle(BaseThrottle, metaclass=abc.ABCMeta):
+    """Ограничение частоты корзиной жетонов.
+
+    Корзина вмещает capacity жетонов и пополняется со скоростью
+    rate жетонов в секунду. Действие тратит столько жетонов,
+    сколько указано в throttle_costs вьюхи.
+
+    Состояние хранится не парой (жетоны, время), а счётчиками
+    потраченных жетонов в окнах длиной capacity / rate секунд:
+    расход — текущее окно плюс убывающая доля предыдущего. Счётчики
+    меняются только атомарными add и incr, поэтому одновременные
+    запросы не теряют списания. Отклонённый запрос возвращает жетоны.
+    Между процессами корзины общие, только если THROTTLE_CACHE —
+    общий кеш с атомарным incr (memcached, Redis).
+    """
+
+    scope = None
+    capacity_setting = None
+    rate_setting = None
+
+    @abc.abstractmethod
+    def get_bucket_key(self, request) -> str:
+        """Ключ корзины клиента или None, если корзина не нужна."""
+
+    def allow_request(self, request, view) -> bool:
+        if not settings.THROTTLE_ENABLED:
+            return True
+
+        key = self.get_bucket_key(request)
+
+        if key is None:
+            return True
+
+        capacity = getattr(settings, self.capacity_setting)
+        rate = getattr(settings, self.rate_setting)
+        cost = min(get_action_cost(view), capacity)
+        cache = get_throttle_cache()
+        window = capacity / rate
+        slot, offset = divmod(time.time(), window)
+        current_key = f'{key}:{int(slot)}'
+        spent = add_spent(cache, current_key, cost, 2 * window + 1)
+        spent += cache.get(f'{key}:{int(slot) - 1}', 0) * (1 - offset / window)
+        self.seconds_to_wait = None
+
+        if spent <= capacity:
+            return True
+
+        try:
+            cache.decr(current_key, cost)
+        except ValueError:
+            # Счётчик вытеснен из кеша: возвращать жетоны некуда.
+            pass
+
+        self.seconds_to_wait = (spent - capacity) / rate
+        metrics.inc(
+            'foodgram_throttled_requests_total',
+            reason=self.scope,
+            action=str(getattr(view, 'action', ''))
+        )
+
+        return False
+
+    def wait(self):
+        return self.seconds_to_wait
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Корзина жетонов авторизованного пользователя."""
+
+    scope = 'user'
+    capacity_setting = 'THROTTLE_USER_CAPACITY'
+    rate_setting = 'THROTTLE_USER_RATE'
+
+    def get_bucket_key(self, request) -> str:
+        if not request.user.is_authenticated:
+            return None
+
+        return f'throttle:user:{request.user.pk}'
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """Корзина жетонов IP-адреса клиента."""
+
+    scope = 'ip'
+    capacity_setting = 'THROTTLE_IP_CAPACITY'
+    rate_setting = 'THROTTLE_IP_RATE'
+
+    def get_bucket_key(self, request) -> str:
+        return f'throttle:ip:{self.get_ident(request)}'
+
+
+class ServiceOverloadedError(APIException):
+    """Сервер занят дорогими запросами, повторите позже."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Сервер перегружен, повторите запрос позже.'
+    default_code = 'service_overloaded'
+
+    def __init__(self, wait: int):
+        super().__init__()
+        self.wait = wait
+
+
+class ConcurrencyLimitMixin:
+    """Ограничивает число одновременно выполняемых дорогих действий.
+
+    Действия из concurrency_limited_actions выполняются, только пока
+    их в работе не больше EXPENSIVE_CONCURRENCY_LIMIT на все процессы,
+    иначе клиент получает 503 с Retry-After. Счётчик хранится в кеше
+    THROTTLE_CACHE; если процесс упал, не освободив место, счётчик
+    сбрасывается через EXPENSIVE_INFLIGHT_TTL секунд простоя.
+    """
+
+    concurrency_limited_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        limit = settings.EXPENSIVE_CONCURRENCY_LIMIT
+
+        if not limit or self.action not in self.concurrency_limited_actions:
+            return
+
+        cache = get_throttle_cache()
+        cache.add(INFLIGHT_KEY, 0, settings.EXPENSIVE_INFLIGHT_TTL)
+        inflight = cache.incr(INFLIGHT_KEY)
+        cache.touch(INFLIGHT_KEY, settings.EXPENSIVE_INFLIGHT_TTL)
+        self.holds_concurrency_slot = True
+
+        if inflight > limit:
+            metrics.inc(
+                'foodgram_throttled_requests_total',
+                reason='concurrency',
+                action=self.action
+            )
+            raise ServiceOverloadedError(settings.EXPENSIVE_RETRY_AFTER)
+
+    def dispatch(self, request, *args, **kwargs):
+        self.holds_concurrency_slot = False
+
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self.holds_concurrency_slot:
+                cache = get_throttle_cache()
+
+                try:
+                    cache.decr(INFLIGHT_KEY)
+                except ValueError:
+                    pass
+                else:
+                    cache.touch(INFLIGHT_KEY, settings.EXPENSIVE_INFLIGHT_TTL)
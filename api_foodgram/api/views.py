@@ -1,23 +1,121 @@
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Sum
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from recipes.models import Favorite, IngredientInRecipe, Recipe, ShoppingCart
+from recipes.models import (Change, Favorite, IngredientInRecipe, Recipe,
+                            ShoppingCart)
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404 as get_values_or_404
 from rest_framework.pagination import LimitOffsetPagination
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
-from services import ingredients, recipes, tags, users
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
+from services import (changes, deletion, ingredients, meal_plan, recipes,
+                      similarity, tags, timeline, trending, users)
 from users.models import Subscription
 
+from . import catalog, metrics, representations
 from .filters import IngredientFilter, RecipeFilter
 from .permissions import IsAuthorOrReadOnly
+from .query_budget import QueryBudgetMixin
 from .serializers import (CustomUserSerializer, FavoriteSerializer,
-                          IngredientSerializer, RecipeCreateSerializer,
-                          RecipeReadSerializer, ShoppingCartSerializer,
+                          IngredientSerializer, MealPlanSerializer,
+                          RecipeCreateSerializer, RecipeReadSerializer,
+                          ShoppingCartSerializer, SimilarRecipeSerializer,
                           SubscriptionSerializer, TagSerializer)
+from .throttling import ConcurrencyLimitMixin
+
+
+class PrometheusTextRenderer(BaseRenderer):
+    """Текстовый формат Prometheus: данные ответа — готовый текст,
+    у ошибок выводится detail.
+    """
+
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = data.get('detail', data)
+
+        return str(data).encode(self.charset)
+
+
+class MetricsView(APIView):
+    """Отдаёт метрики всех процессов в формате Prometheus.
+    Доступно только персоналу.
+    """
+
+    permission_classes = (IsAdminUser,)
+    renderer_classes = (PrometheusTextRenderer, JSONRenderer)
+
+    def get(self, request) -> Response:
+        return Response(metrics.render())
+
+
+class ChangeFeedView(APIView):
+    """Журнал изменений для дельта-синхронизации.
+
+    Без since возвращает только курсор, с которого начинать;
+    с since — изменения после него, по одному на объект.
+    """
+
+    def get(self, request) -> Response:
+        since = request.query_params.get('since')
+
+        if since is None:
+            return Response({
+                'cursor': changes.get_latest_cursor(),
+                'has_more': False,
+                'changes': [],
+            })
+
+        if not since.isdigit():
+            return Response(
+                {'errors': 'Курсор since должен быть целым числом.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        feed, cursor, has_more = changes.get_changes_since(
+            request.user, int(since), settings.CHANGE_FEED_PAGE_SIZE
+        )
+
+        return Response({
+            'cursor': cursor,
+            'has_more': has_more,
+            'changes': feed,
+        })
+
+
+def accepts_gzip(request) -> bool:
+    """Проверяет, принимает ли клиент ответ в gzip."""
+
+    for coding in request.headers.get('Accept-Encoding', '').split(','):
+        name, _, params = coding.strip().partition(';')
+
+        if name.strip().lower() in ('gzip', '*'):
+            return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00')
+
+    return False
+
+
+def parse_etags(header: str) -> set:
+    """Возвращает ETag из If-None-Match без слабого префикса W/."""
+
+    return {
+        etag.strip().replace('W/', '', 1)
+        for etag in header.split(',')
+        if etag.strip()
+    }
 
 
 class RetrieveListViewSet(
@@ -41,6 +139,38 @@ class IngredientViewSet(RetrieveListViewSet):
     pagination_class = None
     filter_backends = (IngredientFilter,)
     search_fields = ('^name',)
+    throttle_costs = {'list': 2}
+
+    def list(self, request, *args, **kwargs):
+        """Метод получения списка ингредиентов.
+        Без поиска отдаёт готовый снимок каталога.
+        """
+
+        if (
+            IngredientFilter.search_param in request.query_params
+            or request.accepted_renderer.format != 'json'
+        ):
+            return super().list(request, *args, **kwargs)
+
+        snapshot = catalog.get_catalog_snapshot()
+        use_gzip = accepts_gzip(request)
+        etag = snapshot.gzip_etag if use_gzip else snapshot.etag
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(
+                snapshot.gzipped if use_gzip else snapshot.raw,
+                content_type='application/json'
+            )
+
+            if use_gzip:
+                response['Content-Encoding'] = 'gzip'
+
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        return response
 
 
 class TagViewSet(RetrieveListViewSet):
@@ -52,22 +182,180 @@ class TagViewSet(RetrieveListViewSet):
     pagination_class = None
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    QueryBudgetMixin,
+    ConcurrencyLimitMixin,
+    viewsets.ModelViewSet
+):
     """Вьюсет для обработки запросов, связанных с рецептами."""
 
     queryset = recipes.get_all_recipes()
     permission_classes = (IsAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    query_budgets = {
+        'list': 10,
+        'retrieve': 10,
+        'create': 22,
+        'update': 25,
+        'partial_update': 25,
+        'destroy': 20,
+        'manage_favorite': 12,
+        'shopping_cart': 10,
+        'download_shopping_cart': 3,
+        'meal_plan': 4,
+        'batch': 10,
+        'similar': 2,
+        'feed': 8,
+    }
+    throttle_costs = {
+        'create': 10,
+        'update': 10,
+        'partial_update': 10,
+        'download_shopping_cart': 20,
+        'meal_plan': 5,
+        'batch': 5,
+    }
+    concurrency_limited_actions = (
+        'create',
+        'update',
+        'partial_update',
+        'download_shopping_cart',
+        'meal_plan',
+    )
+
+    def get_sparse_fields(self) -> tuple:
+        """Метод разбора параметров fields и expand.
+        Возвращает (None, set()), если набор полей не ограничен.
+        """
+
+        params = self.request.query_params
+
+        if 'fields' not in params:
+            return None, set()
+
+        meta = RecipeReadSerializer.Meta
+        fields = set(filter(None, params['fields'].split(',')))
+        expand = set(filter(None, params.get('expand', '').split(',')))
+        errors = {
+            name: sorted(requested - set(allowed))
+            for name, requested, allowed in (
+                ('fields', fields, meta.fields),
+                ('expand', expand, meta.expandable_fields),
+            )
+            if requested - set(allowed)
+        }
+
+        if errors:
+            raise ValidationError({
+                name: f'Неизвестные поля: {", ".join(values)}.'
+                for name, values in errors.items()
+            })
+
+        return fields, expand
+
+    def is_sparse(self) -> bool:
+        """Метод проверки, запрошен ли ограниченный набор полей."""
+
+        return self.get_sparse_fields()[0] is not None
+
+    def get_serializer_context(self):
+        """Метод передачи набора полей в RecipeReadSerializer."""
+
+        context = super().get_serializer_context()
+
+        if self.action in ('list', 'retrieve', 'batch'):
+            fields, expand = self.get_sparse_fields()
+            context.update(fields=fields, expand=expand)
+
+        return context
+
+    def get_queryset(self):
+        """Метод получения рецептов со связями для чтения."""
+
+        if self.action == 'batch' or (
+            self.action in ('list', 'retrieve')
+            and (not settings.RECIPE_FAST_READ or self.is_sparse())
+        ):
+            return recipes.get_recipes_for_read(
+                self.request.user, *self.get_sparse_fields()
+            )
+
+        return super().get_queryset()
 
     def get_serializer_class(self):
         """Метод для вызова сериализатора."""
 
-        if self.action in ('list', 'retrieve'):
+        if self.action in ('list', 'retrieve', 'batch'):
             return RecipeReadSerializer
 
         return RecipeCreateSerializer
 
+    def perform_destroy(self, instance):
+        """Метод удаления рецепта с записью в журнал изменений."""
+
+        deletion.delete_recipe(instance)
+
+    def list(self, request, *args, **kwargs):
+        """Метод получения списка рецептов.
+        При RECIPE_FAST_READ собирает ответ без ModelSerializer.
+        """
+
+        if not settings.RECIPE_FAST_READ or self.is_sparse():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            *representations.RECIPE_VALUES
+        )
+        page = self.paginate_queryset(queryset)
+
+        if page is not None:
+            return self.get_paginated_response(
+                representations.get_recipes_representation(page, request)
+            )
+
+        return Response(
+            representations.get_recipes_representation(queryset, request)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """Метод получения рецепта.
+        При RECIPE_DB_JSON документ собирается в СУБД одним запросом
+        (PostgreSQL и SQLite), при RECIPE_FAST_READ — без ModelSerializer.
+        """
+
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+
+        if (
+            settings.RECIPE_DB_JSON
+            and recipes.supports_recipe_document()
+            and not self.is_sparse()
+            and request.accepted_renderer.format == 'json'
+            and str(lookup).isdigit()
+        ):
+            document = recipes.get_recipe_document(
+                int(lookup),
+                request.user,
+                request.build_absolute_uri(settings.MEDIA_URL)
+            )
+
+            if document is None:
+                raise Http404
+
+            return HttpResponse(document, content_type='application/json')
+
+        if not settings.RECIPE_FAST_READ or self.is_sparse():
+            return super().retrieve(request, *args, **kwargs)
+
+        row = get_values_or_404(
+            self.get_queryset().values(*representations.RECIPE_VALUES),
+            pk=lookup
+        )
+
+        return Response(
+            representations.get_recipes_representation([row], request)[0]
+        )
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -88,7 +376,14 @@ class RecipeViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            Favorite.objects.create(user=user, recipe=recipe)
+            with transaction.atomic():
+                Favorite.objects.create(user=user, recipe=recipe)
+                trending.record_add(recipe.id, trending.FAVORITE_ADDS)
+                changes.record_change(
+                    Change.FAVORITE, recipe.id, Change.UPSERT, user.id,
+                    {'recipe': recipe.id}
+                )
+
             serializer = FavoriteSerializer(recipe)
 
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -100,7 +395,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
 
             if recipe_in_favorite.exists():
-                recipe_in_favorite.delete()
+                with transaction.atomic():
+                    recipe_in_favorite.delete()
+                    changes.record_change(
+                        Change.FAVORITE, recipe.id, Change.DELETE, user.id
+                    )
+
                 return Response(status=status.HTTP_204_NO_CONTENT)
 
         return Response(
@@ -128,7 +428,14 @@ class RecipeViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            ShoppingCart.objects.create(user=user, recipe=recipe)
+            with transaction.atomic():
+                ShoppingCart.objects.create(user=user, recipe=recipe)
+                trending.record_add(recipe.id, trending.CART_ADDS)
+                changes.record_change(
+                    Change.SHOPPING_CART, recipe.id, Change.UPSERT, user.id,
+                    {'recipe': recipe.id}
+                )
+
             serializer = ShoppingCartSerializer(recipe)
 
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -140,7 +447,13 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
 
             if recipe_in_shopping_cart.exists():
-                recipe_in_shopping_cart.delete()
+                with transaction.atomic():
+                    recipe_in_shopping_cart.delete()
+                    changes.record_change(
+                        Change.SHOPPING_CART, recipe.id, Change.DELETE,
+                        user.id
+                    )
+
                 return Response(status=status.HTTP_204_NO_CONTENT)
 
         return Response(
@@ -149,21 +462,27 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
     @staticmethod
-    def ingredients_to_txt(ingredients: dict) -> str:
+    def iter_shopping_list(ingredients: list, chunk_lines: int = 500):
         """Метод для объединения всех ингредиентов
-        в список покупок для выгрузки.
+        в список покупок для выгрузки частями по chunk_lines строк.
         """
 
-        shopping_list = [
-            (
+        lines = []
+
+        for index, ingredient in enumerate(ingredients):
+            lines.append(
+                f"{' ' if index else ''}"
                 f"{ingredient['ingredient__name']}  - "
                 f"{ingredient['sum']}"
                 f"({ingredient['ingredient__measurement_unit']})\n"
             )
-            for ingredient in ingredients
-        ]
 
-        return ' '.join(shopping_list)
+            if len(lines) == chunk_lines:
+                yield ''.join(lines)
+                lines = []
+
+        if lines:
+            yield ''.join(lines)
 
     @action(
         detail=False,
@@ -172,7 +491,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_name='download_shopping_cart',
     )
     def download_shopping_cart(self, request) -> HttpResponse:
-        """Метод для скачивания файла со списком покупок."""
+        """Метод для скачивания файла со списком покупок.
+        Строки выбираются сразу, а отдаются частями: под ASGI
+        медленный клиент не занимает поток.
+        """
 
         ingredients = IngredientInRecipe.objects.filter(
             recipe__shopping_cart__user=request.user
@@ -184,18 +506,199 @@ class RecipeViewSet(viewsets.ModelViewSet):
         ).annotate(
             sum=Sum('amount')
         )
-        shopping_list = self.ingredients_to_txt(ingredients)
 
-        return HttpResponse(shopping_list, content_type='text/plain')
+        return StreamingHttpResponse(
+            self.iter_shopping_list(list(ingredients)),
+            content_type='text/plain'
+        )
+
+    @action(
+        detail=False,
+        permission_classes=(AllowAny,),
+        url_path='batch',
+        url_name='batch',
+    )
+    def batch(self, request) -> Response:
+        """Метод получения набора рецептов по ?ids=1,2,3 одним запросом.
+        Рецепты выдаются в порядке ids, несуществующие — в missing.
+        """
+
+        raw_ids = [
+            value for value in request.query_params.get('ids', '').split(',')
+            if value
+        ]
+
+        if not raw_ids or not all(value.isdigit() for value in raw_ids):
+            raise ValidationError(
+                {'ids': 'Укажите id рецептов через запятую.'}
+            )
+
+        ids = list(dict.fromkeys(int(value) for value in raw_ids))
+
+        if len(ids) > settings.RECIPE_BATCH_MAX_IDS:
+            raise ValidationError({
+                'ids': 'Можно запросить не больше '
+                       f'{settings.RECIPE_BATCH_MAX_IDS} рецептов.'
+            })
+
+        found = {
+            recipe.id: recipe
+            for recipe in self.get_queryset().filter(id__in=ids)
+        }
+        serializer = self.get_serializer(
+            [found[recipe_id] for recipe_id in ids if recipe_id in found],
+            many=True
+        )
+
+        return Response({
+            'results': serializer.data,
+            'missing': [
+                recipe_id for recipe_id in ids if recipe_id not in found
+            ],
+        })
+
+    @action(
+        detail=True,
+        permission_classes=(AllowAny,),
+        url_path='similar',
+        url_name='similar',
+    )
+    def similar(self, request, pk) -> Response:
+        """Метод получения похожих по составу рецептов
+        из заранее рассчитанного индекса.
+        """
+
+        similar_recipes = (
+            similarity.get_similar_recipes(int(pk))
+            if str(pk).isdigit() else None
+        )
+
+        if similar_recipes is None:
+            raise Http404
+
+        serializer = SimilarRecipeSerializer(
+            similar_recipes,
+            many=True,
+            context=self.get_serializer_context()
+        )
+
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        url_path='feed',
+        url_name='feed',
+    )
+    def feed(self, request) -> Response:
+        """Метод получения ленты рецептов авторов из подписок.
+
+        Страницы выдаются по ключу: ?before= — id последнего рецепта
+        предыдущей страницы, ?limit= — размер страницы.
+        """
+
+        params = {
+            name: request.query_params.get(name)
+            for name in ('before', 'limit')
+        }
+        invalid = [
+            name for name, value in params.items()
+            if value is not None and (not value.isdigit() or not int(value))
+        ]
+
+        if invalid:
+            raise ValidationError({
+                name: 'Укажите целое положительное число.'
+                for name in invalid
+            })
+
+        limit = min(
+            int(params['limit'] or settings.REST_FRAMEWORK['PAGE_SIZE']),
+            settings.TIMELINE_MAX_PAGE_SIZE
+        )
+        ids, has_more = timeline.get_timeline(
+            request.user,
+            int(params['before']) if params['before'] else None,
+            limit
+        )
+        found = {
+            recipe.id: recipe
+            for recipe in recipes.get_recipes_for_read(
+                request.user
+            ).filter(id__in=ids)
+        }
+        serializer = RecipeReadSerializer(
+            [found[recipe_id] for recipe_id in ids if recipe_id in found],
+            many=True,
+            context=self.get_serializer_context()
+        )
 
+        return Response({
+            'next': replace_query_param(
+                request.build_absolute_uri(), 'before', ids[-1]
+            ) if has_more else None,
+            'results': serializer.data,
+        })
 
-class CustomUserViewSet(UserViewSet):
+    @action(
+        detail=False,
+        methods=('post',),
+        permission_classes=(IsAuthenticated,),
+        url_path='meal_plan',
+        url_name='meal_plan',
+    )
+    def meal_plan(self, request) -> Response:
+        """Метод получения списка покупок для плана питания
+        без изменения корзины.
+        """
+
+        serializer = MealPlanSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        shopping_list, missing = meal_plan.get_meal_plan(
+            serializer.validated_data['recipes']
+        )
+
+        if missing:
+            return Response(
+                {
+                    'errors': 'В плане указаны несуществующие рецепты.',
+                    'missing': missing,
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(shopping_list)
+
+
+class CustomUserViewSet(QueryBudgetMixin, UserViewSet):
     """Обрабатывает пользователей."""
 
     queryset = users.get_all_users()
     serializer_class = CustomUserSerializer
     pagination_class = LimitOffsetPagination
     permission_classes = (AllowAny,)
+    query_budgets = {
+        'list': 5,
+        'retrieve': 5,
+        'get_me': 3,
+        'get_subscriptions': 6,
+        'manage_subscriptions': 10,
+    }
+
+    def get_queryset(self):
+        """Метод получения пользователей с признаком подписки."""
+
+        if self.action in ('list', 'retrieve'):
+            return users.get_users_with_subscription(self.request.user)
+
+        return super().get_queryset()
+
+    def perform_destroy(self, instance):
+        """Метод удаления пользователя: пользователь деактивируется,
+        а его данные удаляются в очереди задач.
+        """
+
+        deletion.schedule_user_deletion(instance)
 
     @action(
         methods=['get'],
@@ -261,7 +764,13 @@ class CustomUserViewSet(UserViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            users.create_subscription(user, author)
+            with transaction.atomic():
+                users.create_subscription(user, author)
+                timeline.subscribe(user.id, author.id)
+                changes.record_change(
+                    Change.SUBSCRIPTION, author.id, Change.UPSERT, user.id,
+                    {'author': author.id}
+                )
 
             return Response(
                 f'Вы подписались на {author}',
@@ -270,7 +779,14 @@ class CustomUserViewSet(UserViewSet):
 
         if request.method == 'DELETE':
             if subscription_status.exists():
-                subscription_status.delete()
+                with transaction.atomic():
+                    subscription_status.delete()
+                    timeline.unsubscribe(user.id, author.id)
+                    changes.record_change(
+                        Change.SUBSCRIPTION, author.id, Change.DELETE,
+                        user.id
+                    )
+
                 return Response(
                     f'Вы отписались от {author}',
                     status=status.HTTP_204_NO_CONTENT
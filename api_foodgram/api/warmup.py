@@ -0,0 +1,91 @@
+import gc
+import time
+
+from django.core.cache import caches
+from django.db import connections
+from django.urls import get_resolver
+from rest_framework import serializers as drf_serializers
+from rest_framework.renderers import JSONRenderer
+from services import tags
+
+from . import catalog, serializers
+
+
+def compile_serializers() -> int:
+    """Строит поля всех сериализаторов API и возвращает их число.
+
+    Заполняет кеши _meta моделей и импортирует модули полей
+    и валидаторов, которые иначе загружаются первым запросом.
+    """
+
+    count = 0
+
+    for value in vars(serializers).values():
+        if (
+            isinstance(value, type)
+            and issubclass(value, drf_serializers.Serializer)
+            and value.__module__ == serializers.__name__
+        ):
+            count += len(value().fields)
+
+    return count
+
+
+def prime_tags() -> int:
+    """Сериализует все теги, прогревая путь ответа /api/tags/."""
+
+    data = serializers.TagSerializer(tags.get_all_tags(), many=True).data
+    JSONRenderer().render(data)
+
+    return len(data)
+
+
+def reset_caches() -> None:
+    """Закрывает открытые в процессе клиенты кеша и забывает их.
+
+    close() клиента memcached с пулом соединений сокеты не закрывает,
+    поэтому объект кеша удаляется целиком: воркер после форка создаст
+    свой клиент при первом обращении.
+    """
+
+    for alias in caches:
+        backend = getattr(caches._connections, alias, None)
+
+        if backend is None:
+            continue
+
+        backend.close()
+        vars(backend).pop('_cache', None)
+        del caches[alias]
+
+
+def warm_up() -> dict:
+    """Прогревает процесс перед форком воркеров gunicorn.
+
+    Загружает URL-схему, собирает сериализаторы, снимок каталога
+    ингредиентов и теги, затем закрывает соединения с БД и клиенты
+    кеша, чтобы воркеры не унаследовали общие сокеты, и замораживает
+    объекты сборщика мусора: память остаётся общей после форка
+    (copy-on-write).
+    Возвращает длительности шагов в миллисекундах.
+    """
+
+    timings = {}
+    steps = (
+        ('urls', lambda: get_resolver().reverse_dict),
+        ('serializers', compile_serializers),
+        ('ingredients', catalog.get_catalog_snapshot),
+        ('tags', prime_tags),
+    )
+
+    for name, step in steps:
+        started = time.perf_counter()
+        step()
+        timings[name] = round((time.perf_counter() - started) * 1000, 3)
+
+    connections.close_all()
+    reset_caches()
+    gc.collect()
+    gc.freeze()
+
+    return timings
@@ -0,0 +1,39 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+def get_replicas() -> list:
+    return [alias for alias in settings.DATABASES if alias != 'default']
+
+
+class ReplicaRouter:
+    """Направляет чтение на реплики, запись — на основную БД.
+
+    Чтение с реплик разрешается только внутри безопасных запросов,
+    для которых ReplicaPinningMiddleware включила replica_reads.
+    Команды управления, транзакции и запросы после собственных
+    изменений пользователя читают из основной БД.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+
+        if (
+            not replicas
+            or not replica_reads.get()
+            or connections['default'].in_atomic_block
+        ):
+            return 'default'
+
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
@@ -1,10 +1,14 @@
 import os
+import sys
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv('SECRET_KEY', default='key_default')
 
 # SECURITY WARNING: don't run with debug turned on in production!
+# DEBUG всегда выключен, поэтому бюджеты SQL-запросов в разработке
+# проверяются через QUERY_BUDGET_MODE=raise (см. ниже и README),
+# а под manage.py test — по умолчанию.
 DEBUG = False
 
 ALLOWED_HOSTS = ['*']
@@ -24,9 +28,12 @@ INSTALLED_APPS = [
     'api',
     'users',
     'recipes',
+    'jobs',
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -34,9 +41,11 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ProfilingMiddleware',
 ]
 
-ROOT_URLCONF = 'api_foodgram.urls'
+# asgi.py подставляет api_foodgram.asgi_urls с асинхронными вьюхами.
+ROOT_URLCONF = os.getenv('ROOT_URLCONF', 'api_foodgram.urls')
 
 TEMPLATES = [
     {
@@ -55,6 +64,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'api_foodgram.wsgi.application'
+ASGI_APPLICATION = 'api_foodgram.asgi.application'
 
 
 DATABASES = {
@@ -68,6 +78,41 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения через запятую: хосты для PostgreSQL
+# или файлы для SQLite, например DB_REPLICAS=replica.sqlite3.
+REPLICA_SETTING = (
+    'NAME' if 'sqlite3' in (DATABASES['default']['ENGINE'] or '') else 'HOST'
+)
+
+for index, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(','))
+):
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        REPLICA_SETTING: replica.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['api_foodgram.db_router.ReplicaRouter']
+
+# Сколько секунд после изменений клиент читает из основной БД
+# и алиас общего для процессов кеша из CACHES, где закрепляются
+# клиенты с токеном. Без REPLICA_PIN_CACHE запросы с токеном
+# не читают с реплик.
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+REPLICA_PIN_CACHE = os.getenv('REPLICA_PIN_CACHE')
+
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -112,10 +157,15 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'api.throttling.UserTokenBucketThrottle',
+        'api.throttling.IPTokenBucketThrottle',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 1)),
 }
 
 DJOSER = {
@@ -132,4 +182,134 @@ DJOSER = {
     'HIDE_USERS': False,
 }
 
+# Сборка ответов list/retrieve рецептов без ModelSerializer.
+RECIPE_FAST_READ = os.getenv('RECIPE_FAST_READ', 'False') == 'True'
+
+# Каталог, через который процессы gunicorn обмениваются метриками.
+# Без него метрики отдаются только по текущему процессу.
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 1))
+
+# Реакция на превышение бюджета SQL-запросов вьюсетов:
+# raise, log, metric или off. По умолчанию raise в тестах
+# и с DEBUG, иначе metric; в dev-окружении задаётся в .env.
+QUERY_BUDGET_MODE = os.getenv(
+    'QUERY_BUDGET_MODE',
+    'raise' if DEBUG or sys.argv[1:2] == ['test'] else 'metric'
+)
+
+# Кеш токенов авторизации: размер LRU процесса, время жизни записи
+# в секундах и необязательный алиас общего кеша из CACHES.
+# Отзыв токена сразу виден всем процессам только с общим кешем,
+# без него другие воркеры принимают токен до TOKEN_AUTH_CACHE_TTL.
+TOKEN_AUTH_CACHE_SIZE = int(os.getenv('TOKEN_AUTH_CACHE_SIZE', 1024))
+TOKEN_AUTH_CACHE_TTL = int(os.getenv('TOKEN_AUTH_CACHE_TTL', 10))
+TOKEN_AUTH_SHARED_CACHE = os.getenv('TOKEN_AUTH_SHARED_CACHE')
+
+# Максимальный возраст снимка каталога ингредиентов в секундах.
+# При общем кеше снимок пересобирается сразу после изменений.
+INGREDIENT_CATALOG_MAX_AGE = int(
+    os.getenv('INGREDIENT_CATALOG_MAX_AGE', 300)
+)
+
+# Очередь отложенных задач: JOBS_EAGER выполняет задачи сразу
+# после фиксации транзакции, без run_workers.
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'False') == 'True'
+JOBS_RETRY_DELAY = int(os.getenv('JOBS_RETRY_DELAY', 10))
+
+# Сборка JSON рецепта для retrieve одним запросом в СУБД
+# (PostgreSQL и SQLite).
+RECIPE_DB_JSON = os.getenv('RECIPE_DB_JSON', 'False') == 'True'
+
+# Профилирование запросов сотрудников (X-Profile или ?profile=1)
+# под WSGI и ASGI: каталог кольцевого буфера профилей, число
+# хранимых профилей и размер топа функций в сводке.
+# Без PROFILE_DIR профилирование выключено.
+PROFILE_DIR = os.getenv('PROFILE_DIR')
+PROFILE_MAX_ENTRIES = int(os.getenv('PROFILE_MAX_ENTRIES', 50))
+PROFILE_TOP_FUNCTIONS = int(os.getenv('PROFILE_TOP_FUNCTIONS', 30))
+
+# План питания: максимум рецептов в запросе, алиас общего кеша
+# векторов ингредиентов рецептов из CACHES и время жизни вектора
+# в секундах. Без MEAL_PLAN_VECTOR_CACHE векторы хранятся в LRU
+# процесса: размер и время жизни записи в секундах. Сброс вектора
+# виден другим процессам только с общим кешем.
+MEAL_PLAN_MAX_RECIPES = int(os.getenv('MEAL_PLAN_MAX_RECIPES', 500))
+MEAL_PLAN_VECTOR_CACHE = os.getenv('MEAL_PLAN_VECTOR_CACHE')
+MEAL_PLAN_VECTOR_TTL = int(os.getenv('MEAL_PLAN_VECTOR_TTL', 86400))
+MEAL_PLAN_LOCAL_CACHE_SIZE = int(
+    os.getenv('MEAL_PLAN_LOCAL_CACHE_SIZE', 4096)
+)
+MEAL_PLAN_LOCAL_CACHE_TTL = int(os.getenv('MEAL_PLAN_LOCAL_CACHE_TTL', 60))
+
+# Размер страницы журнала изменений.
+CHANGE_FEED_PAGE_SIZE = int(os.getenv('CHANGE_FEED_PAGE_SIZE', 500))
+
+# Размер пачки при удалении пользователей и рецептов.
+DELETION_CHUNK_SIZE = int(os.getenv('DELETION_CHUNK_SIZE', 500))
+
+# Максимум рецептов в одном запросе /api/recipes/batch/.
+RECIPE_BATCH_MAX_IDS = int(os.getenv('RECIPE_BATCH_MAX_IDS', 100))
+
+# Начиная с этого числа строк админка берёт оценку из статистики
+# PostgreSQL вместо COUNT(*) для списков без фильтров.
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(
+    os.getenv('ADMIN_ESTIMATED_COUNT_THRESHOLD', 10000)
+)
+
+# Ограничение частоты запросов корзинами жетонов: ёмкость корзины
+# и скорость пополнения в жетонах в секунду для пользователя и IP.
+# Состояние хранится в кеше THROTTLE_CACHE. Он должен быть общим
+# для процессов и с атомарным incr (memcached, Redis): с LocMemCache
+# у каждого воркера gunicorn свои корзины и свой счётчик дорогих
+# запросов. IP клиента берётся из X-Forwarded-For с учётом
+# NUM_PROXIES прокси перед приложением (nginx в infra).
+THROTTLE_ENABLED = os.getenv('THROTTLE_ENABLED', 'True') == 'True'
+THROTTLE_CACHE = os.getenv('THROTTLE_CACHE', 'default')
+THROTTLE_USER_CAPACITY = int(os.getenv('THROTTLE_USER_CAPACITY', 60))
+THROTTLE_USER_RATE = float(os.getenv('THROTTLE_USER_RATE', 1))
+THROTTLE_IP_CAPACITY = int(os.getenv('THROTTLE_IP_CAPACITY', 120))
+THROTTLE_IP_RATE = float(os.getenv('THROTTLE_IP_RATE', 2))
+
+# Сколько дорогих запросов может выполняться одновременно
+# (0 — без ограничения), Retry-After для отклонённых и через сколько
+# секунд простоя сбрасывается счётчик выполняемых запросов.
+EXPENSIVE_CONCURRENCY_LIMIT = int(
+    os.getenv('EXPENSIVE_CONCURRENCY_LIMIT', 8)
+)
+EXPENSIVE_RETRY_AFTER = int(os.getenv('EXPENSIVE_RETRY_AFTER', 1))
+EXPENSIVE_INFLIGHT_TTL = int(os.getenv('EXPENSIVE_INFLIGHT_TTL', 60))
+
+# Похожие рецепты: число соседей в индексе, размер блока полного
+# пересчёта в ячейках матрицы сходства и пачка списков соседей,
+# обновляемых после сохранения рецепта.
+SIMILAR_RECIPES_K = int(os.getenv('SIMILAR_RECIPES_K', 10))
+SIMILARITY_BLOCK_CELLS = int(os.getenv('SIMILARITY_BLOCK_CELLS', 4000000))
+SIMILARITY_UPDATE_CHUNK_SIZE = int(
+    os.getenv('SIMILARITY_UPDATE_CHUNK_SIZE', 500)
+)
+
+# Наибольшее окно ordering=trending в сутках.
+TRENDING_MAX_WINDOW_DAYS = int(os.getenv('TRENDING_MAX_WINDOW_DAYS', 90))
+
+# Лента подписок: начиная с этого числа подписчиков рецепты автора
+# подмешиваются в ленты при чтении, а не раскладываются при публикации;
+# пачка раскладки, число рецептов автора, добавляемых в ленту
+# после подписки, и наибольший размер страницы ленты.
+TIMELINE_PULL_FOLLOWERS = int(os.getenv('TIMELINE_PULL_FOLLOWERS', 5000))
+TIMELINE_FANOUT_CHUNK_SIZE = int(
+    os.getenv('TIMELINE_FANOUT_CHUNK_SIZE', 1000)
+)
+TIMELINE_BACKFILL_SIZE = int(os.getenv('TIMELINE_BACKFILL_SIZE', 100))
+TIMELINE_MAX_PAGE_SIZE = int(os.getenv('TIMELINE_MAX_PAGE_SIZE', 50))
+# Обновление микрокеша nginx после изменения рецептов, тегов
+# и ингредиентов: адрес служебного сервера nginx (без него обновление
+# выключено), имена сайта, под которыми ответы лежат в кеше,
+# и таймаут запроса в секундах.
+NGINX_PURGE_URL = os.getenv('NGINX_PURGE_URL')
+NGINX_PURGE_HOSTS = list(
+    filter(None, os.getenv('NGINX_PURGE_HOSTS', '').split(','))
+)
+NGINX_PURGE_TIMEOUT = float(os.getenv('NGINX_PURGE_TIMEOUT', 2))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -0,0 +1,52 @@
+import multiprocessing
+import os
+import shutil
+
+
+def get_cpu_count() -> int:
+    """Число процессоров, доступных процессу (с учётом affinity)."""
+
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+cpu_count = get_cpu_count()
+
+bind = os.getenv('GUNICORN_BIND', '0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', cpu_count * 2 + 1))
+# Потоки растут с числом процессоров медленнее воркеров: каждый поток
+# держит своё соединение с БД, а воркеров уже 2 * CPU + 1.
+threads = int(os.getenv('GUNICORN_THREADS', max(2, cpu_count // 2)))
+# uvicorn.workers.UvicornWorker для api_foodgram.asgi:application.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+accesslog = os.getenv('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+
+# Сердцебиение воркеров в памяти, а не на overlay-диске контейнера.
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+
+def on_starting(server):
+    """Удаляет метрики процессов прошлого запуска из METRICS_DIR."""
+
+    directory = os.getenv('METRICS_DIR')
+
+    if directory and os.path.isdir(directory):
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def when_ready(server):
+    """Прогревает загруженное приложение до форка воркеров."""
+
+    if not server.cfg.preload_app:
+        return
+
+    from api.warmup import warm_up
+
+    server.log.info('Warm-up before fork: %s', warm_up())
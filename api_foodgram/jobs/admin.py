@@ -0,0 +1,10 @@
+from django.contrib.admin import ModelAdmin, register
+
+from .models import Job
+
+
+@register(Job)
+class JobAdmin(ModelAdmin):
+    list_display = ('func', 'status', 'priority', 'attempts', 'run_after')
+    list_filter = ('status',)
+    search_fields = ('func',)
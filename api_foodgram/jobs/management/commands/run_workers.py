@@ -0,0 +1,92 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management import BaseCommand
+from django.db import close_old_connections, connections
+from services import jobs
+
+
+def work(stop, poll_interval: float, visibility_timeout: float, once: bool):
+    """Цикл обработчика: берёт и выполняет задачи, пока не остановлен."""
+
+    while not stop.is_set():
+        close_old_connections()
+        job = jobs.claim_job(visibility_timeout)
+
+        if job is None:
+            if once:
+                break
+
+            stop.wait(poll_interval)
+            continue
+
+        jobs.run_job(job)
+
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Запускает обработчики очереди отложенных задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument(
+            '--mode',
+            choices=('thread', 'process'),
+            default='thread'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Пауза в секундах, если очередь пуста'
+        )
+        parser.add_argument(
+            '--visibility-timeout',
+            type=float,
+            default=300.0,
+            help='Через сколько секунд задачу упавшего обработчика '
+                 'возьмёт другой'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить все готовые задачи и завершиться'
+        )
+
+    def handle(self, *args, **options):
+        if options['mode'] == 'process':
+            connections.close_all()
+            stop = multiprocessing.Event()
+            worker_class = multiprocessing.Process
+        else:
+            stop = threading.Event()
+            worker_class = threading.Thread
+
+        def shutdown(signum, frame):
+            stop.set()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        workers = [
+            worker_class(
+                target=work,
+                args=(
+                    stop,
+                    options['poll_interval'],
+                    options['visibility_timeout'],
+                    options['once'],
+                ),
+                daemon=True
+            )
+            for _ in range(options['workers'])
+        ]
+
+        for worker in workers:
+            worker.start()
+
+        for worker in workers:
+            while worker.is_alive():
+                worker.join(timeout=1)
@@ -0,0 +1,73 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Завершилась ошибкой'),
+    )
+
+    func = models.CharField(
+        verbose_name='Функция',
+        max_length=255
+    )
+    args = models.JSONField(
+        verbose_name='Позиционные аргументы',
+        default=list
+    )
+    kwargs = models.JSONField(
+        verbose_name='Именованные аргументы',
+        default=dict
+    )
+    priority = models.IntegerField(
+        verbose_name='Приоритет',
+        default=0
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=16,
+        choices=STATUSES,
+        default=QUEUED
+    )
+    attempts = models.PositiveIntegerField(
+        verbose_name='Попытки',
+        default=0
+    )
+    max_attempts = models.PositiveIntegerField(
+        verbose_name='Максимум попыток',
+        default=3
+    )
+    run_after = models.DateTimeField(
+        verbose_name='Выполнить не раньше',
+        default=timezone.now
+    )
+    locked_until = models.DateTimeField(
+        verbose_name='Занята обработчиком до',
+        null=True,
+        blank=True
+    )
+    last_error = models.TextField(
+        verbose_name='Последняя ошибка',
+        blank=True
+    )
+    created = models.DateTimeField(
+        verbose_name='Создана',
+        auto_now_add=True
+    )
+
+    class Meta:
+        ordering = ['-priority', 'run_after', 'id']
+        indexes = [
+            models.Index(
+                fields=['status', '-priority', 'run_after'],
+                name='job_queue_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.func} ({self.get_status_display()})'
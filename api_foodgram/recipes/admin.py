@@ -1,41 +1,103 @@
 from django.contrib.admin import ModelAdmin, register
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from services import deletion
 
-from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+from .models import (Change, Favorite, Ingredient, IngredientInRecipe, Recipe,
                      ShoppingCart, Tag)
+from .paginators import EstimatedCountPaginator
+
+
+class LargeTableAdmin(ModelAdmin):
+    """Основа админок больших таблиц: без полного COUNT(*)
+    и с оценкой числа строк для выборки без фильтров.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@register(Change)
+class ChangeAdmin(LargeTableAdmin):
+    list_display = ('id', 'kind', 'object_id', 'action', 'user', 'created')
+    list_filter = ('kind', 'action')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    search_fields = ('=object_id',)
 
 
 @register(Favorite)
-class FavoriteAdmin(ModelAdmin):
+class FavoriteAdmin(LargeTableAdmin):
     list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
 
 
 @register(Ingredient)
 class IngredientAdmin(ModelAdmin):
     list_display = ('name', 'measurement_unit')
-    list_filter = ('name',)
+    search_fields = ('^name',)
 
 
 @register(IngredientInRecipe)
-class IngredientInRecipeAdmin(ModelAdmin):
+class IngredientInRecipeAdmin(LargeTableAdmin):
     list_display = ('recipe', 'ingredient', 'amount')
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
+    search_fields = ('recipe__name', '^ingredient__name')
 
 
 @register(Recipe)
-class RecipeAdmin(ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     list_display = ('name', 'author', 'get_favorites')
-    list_filter = ('author', 'name', 'tags')
+    list_filter = ('tags',)
+    list_select_related = ('author',)
+    autocomplete_fields = ('author',)
+    search_fields = ('name', 'author__username', 'author__email')
+
+    def get_queryset(self, request):
+        """Метод добавления числа добавлений в избранное
+        коррелированным подзапросом: считается только для строк
+        текущей страницы.
+        """
+
+        favorites = Favorite.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            count=Count('pk')
+        ).values('count')
+
+        return super().get_queryset(request).annotate(
+            favorites_count=Coalesce(Subquery(favorites), 0)
+        )
 
     def get_favorites(self, obj):
         """Метод для подсчёта общего числа
         добавлений рецепта в избранное.
         """
 
-        return obj.favorites.count()
+        return obj.favorites_count
+
+    get_favorites.admin_order_field = 'favorites_count'
+
+    def delete_model(self, request, obj):
+        """Метод удаления рецепта с записью в журнал изменений."""
+
+        deletion.delete_recipe(obj)
+
+    def delete_queryset(self, request, queryset):
+        """Метод удаления выбранных рецептов пачками."""
+
+        deletion.delete_recipes_in_chunks(queryset)
 
 
 @register(ShoppingCart)
-class ShoppingCartAdmin(ModelAdmin):
+class ShoppingCartAdmin(LargeTableAdmin):
     list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
 
 
 @register(Tag)
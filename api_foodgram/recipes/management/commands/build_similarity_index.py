@@ -0,0 +1,33 @@
+import time
+
+from django.core.management import BaseCommand
+from services import similarity
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает индекс похожих рецептов: топ соседей каждого '
+        'рецепта по коэффициенту Жаккара составов ингредиентов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--k',
+            type=int,
+            help='Число соседей рецепта, по умолчанию SIMILAR_RECIPES_K'
+        )
+        parser.add_argument(
+            '--block-cells',
+            type=int,
+            help='Размер блока в ячейках матрицы сходства, '
+                 'по умолчанию SIMILARITY_BLOCK_CELLS'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = similarity.build_index(options['k'], options['block_cells'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс построен для {count} рецептов '
+            f'за {time.perf_counter() - started:.2f} с'
+        ))
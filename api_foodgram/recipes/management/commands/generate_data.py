@@ -0,0 +1,231 @@
+import base64
+import random
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, Tag)
+from users.models import CustomUser, Subscription
+
+SYNTHETIC_IMAGE = 'recipes/synthetic.png'
+SYNTHETIC_IMAGE_CONTENT = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8Dw'
+    'HwAFBQIAX8jx0gAAAABJRU5ErkJggg=='
+)
+
+
+def bulk_insert(model, objects, batch_size: int) -> None:
+    """Вставляет объекты пачками, не держа в памяти весь набор."""
+
+    objects = iter(objects)
+
+    while True:
+        batch = list(islice(objects, batch_size))
+
+        if not batch:
+            return
+
+        model.objects.bulk_create(batch, batch_size=batch_size)
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует детерминированный набор пользователей, рецептов, '
+        'избранного, покупок и подписок для нагрузочного тестирования'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--tags-per-recipe', type=int, default=2)
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--carts-per-user', type=int, default=5)
+        parser.add_argument('--subscriptions-per-user', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--prefix',
+            default='synthetic',
+            help='Префикс логинов и email создаваемых пользователей'
+        )
+        parser.add_argument(
+            '--password',
+            default='foodgram-benchmark',
+            help='Пароль всех создаваемых пользователей'
+        )
+
+    def handle(self, *args, **options):
+        ingredient_ids = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        )
+        tag_ids = list(Tag.objects.order_by('id').values_list('id', flat=True))
+
+        if not ingredient_ids or not tag_ids:
+            raise CommandError(
+                'Сначала загрузите ингредиенты и теги: '
+                'upload_data и upload_tags.'
+            )
+
+        prefix = options['prefix']
+
+        if CustomUser.objects.filter(
+            username__startswith=f'{prefix}_'
+        ).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {prefix} уже существуют.'
+            )
+
+        if not default_storage.exists(SYNTHETIC_IMAGE):
+            default_storage.save(
+                SYNTHETIC_IMAGE,
+                ContentFile(SYNTHETIC_IMAGE_CONTENT)
+            )
+
+        generator = random.Random(options['seed'])
+        batch_size = options['batch_size']
+
+        with transaction.atomic():
+            user_ids = self.create_users(options, batch_size)
+            recipe_ids = self.create_recipes(
+                generator, user_ids, options, batch_size
+            )
+            self.create_recipe_relations(
+                generator, recipe_ids, ingredient_ids, tag_ids, options,
+                batch_size
+            )
+            self.create_user_lists(
+                generator, user_ids, recipe_ids, options, batch_size
+            )
+
+        self.stdout.write(
+            f'Создано пользователей: {len(user_ids)}, '
+            f'рецептов: {len(recipe_ids)}'
+        )
+
+    def create_users(self, options, batch_size) -> list:
+        prefix = options['prefix']
+        password = make_password(options['password'])
+        bulk_insert(
+            CustomUser,
+            (
+                CustomUser(
+                    username=f'{prefix}_{number}',
+                    email=f'{prefix}_{number}@example.com',
+                    first_name='Имя',
+                    last_name=f'Фамилия {number}',
+                    password=password
+                )
+                for number in range(options['users'])
+            ),
+            batch_size
+        )
+
+        return list(
+            CustomUser.objects.filter(
+                username__startswith=f'{prefix}_'
+            ).order_by('id').values_list('id', flat=True)
+        )
+
+    def create_recipes(self, generator, user_ids, options, batch_size):
+        bulk_insert(
+            Recipe,
+            (
+                Recipe(
+                    name=f'Рецепт {number}',
+                    text=f'Описание рецепта {number}. ' * 10,
+                    image=SYNTHETIC_IMAGE,
+                    cooking_time=generator.randint(1, 180),
+                    author_id=generator.choice(user_ids)
+                )
+                for number in range(options['recipes'])
+            ),
+            batch_size
+        )
+
+        return list(
+            Recipe.objects.filter(
+                author_id__in=user_ids
+            ).order_by('id').values_list('id', flat=True)
+        )
+
+    def create_recipe_relations(
+        self, generator, recipe_ids, ingredient_ids, tag_ids, options,
+        batch_size
+    ) -> None:
+        ingredients_count = min(
+            options['ingredients_per_recipe'], len(ingredient_ids)
+        )
+        tags_count = min(options['tags_per_recipe'], len(tag_ids))
+
+        bulk_insert(
+            IngredientInRecipe,
+            (
+                IngredientInRecipe(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=generator.randint(1, 500)
+                )
+                for recipe_id in recipe_ids
+                for ingredient_id in generator.sample(
+                    ingredient_ids, ingredients_count
+                )
+            ),
+            batch_size
+        )
+        bulk_insert(
+            Recipe.tags.through,
+            (
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in generator.sample(tag_ids, tags_count)
+            ),
+            batch_size
+        )
+
+    def create_user_lists(
+        self, generator, user_ids, recipe_ids, options, batch_size
+    ) -> None:
+        favorites_count = min(options['favorites_per_user'], len(recipe_ids))
+        carts_count = min(options['carts_per_user'], len(recipe_ids))
+        subscriptions_count = max(
+            min(options['subscriptions_per_user'], len(user_ids) - 1), 0
+        )
+
+        bulk_insert(
+            Favorite,
+            (
+                Favorite(user_id=user_id, recipe_id=recipe_id)
+                for user_id in user_ids
+                for recipe_id in generator.sample(recipe_ids, favorites_count)
+            ),
+            batch_size
+        )
+        bulk_insert(
+            ShoppingCart,
+            (
+                ShoppingCart(user_id=user_id, recipe_id=recipe_id)
+                for user_id in user_ids
+                for recipe_id in generator.sample(recipe_ids, carts_count)
+            ),
+            batch_size
+        )
+        bulk_insert(
+            Subscription,
+            (
+                Subscription(user_id=user_id, author_id=author_id)
+                for user_id in user_ids
+                for author_id in [
+                    author_id
+                    for author_id in generator.sample(
+                        user_ids, subscriptions_count + 1
+                    )
+                    if author_id != user_id
+                ][:subscriptions_count]
+            ),
+            batch_size
+        )
@@ -0,0 +1,16 @@
+from django.core.management import BaseCommand
+from services import timeline
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает ленты подписок по текущим подпискам и рецептам'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = timeline.rebuild_timeline(options['batch_size'])
+
+        self.stdout.write(f'Записей лент: {count}')
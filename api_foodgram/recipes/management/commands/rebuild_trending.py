@@ -0,0 +1,17 @@
+from django.core.management import BaseCommand
+from services import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает суточную сводку добавлений рецептов в избранное '
+        'и покупки по времени создания записей'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = trending.rebuild_activity(options['batch_size'])
+
+        self.stdout.write(f'Строк сводки: {count}')
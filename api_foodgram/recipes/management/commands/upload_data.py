@@ -1,5 +1,6 @@
 import json
 
+from api.catalog import bump_catalog_version
 from django.core.management import BaseCommand
 from recipes.models import Ingredient
 
@@ -25,3 +26,4 @@ class Command(BaseCommand):
             ]
 
             Ingredient.objects.bulk_create(ingredients)
+            bump_catalog_version()
@@ -0,0 +1,22 @@
+# Generated by Django 3.2 on 2026-10-19 11:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_change'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSimilarity',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='similarity', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('neighbours', models.BinaryField(verbose_name='Похожие рецепты')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Время расчёта')),
+            ],
+        ),
+    ]
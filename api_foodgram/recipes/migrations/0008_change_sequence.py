@@ -0,0 +1,35 @@
+# Generated by Django 3.2 on 2026-10-19 12:17
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def number_existing_changes(apps, schema_editor):
+    Change = apps.get_model('recipes', 'Change')
+    Change.objects.update(sequence=F('id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_tag_ingredientinrecipe_ordering'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='change',
+            name='change_user_idx',
+        ),
+        migrations.AddField(
+            model_name='change',
+            name='sequence',
+            field=models.BigIntegerField(blank=True, null=True, unique=True, verbose_name='Номер в журнале'),
+        ),
+        migrations.RunPython(
+            number_existing_changes, migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['user', 'sequence'], name='change_user_sequence_idx'),
+        ),
+    ]
@@ -44,6 +44,9 @@ class Tag(models.Model):
         ]
     )
 
+    class Meta:
+        ordering = ['id']
+
     def __str__(self):
         return self.name
 
@@ -104,6 +107,7 @@ class IngredientInRecipe(models.Model):
     )
 
     class Meta:
+        ordering = ['id']
         constraints = [
             models.UniqueConstraint(
                 fields=['recipe', 'ingredient'],
@@ -128,6 +132,11 @@ class Favorite(models.Model):
         related_name='favorites',
         on_delete=models.CASCADE
     )
+    created = models.DateTimeField(
+        verbose_name='Время добавления',
+        auto_now_add=True,
+        null=True
+    )
 
     class Meta:
         constraints = [
@@ -154,6 +163,11 @@ class ShoppingCart(models.Model):
         related_name='shopping_cart',
         on_delete=models.CASCADE
     )
+    created = models.DateTimeField(
+        verbose_name='Время добавления',
+        auto_now_add=True,
+        null=True
+    )
 
     class Meta:
         constraints = [
@@ -165,3 +179,206 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.recipe} в списке покупок у {self.user}'
+
+
+class Change(models.Model):
+    """Запись журнала изменений для дельта-синхронизации клиентов.
+
+    Изменения рецептов и их состава видны всем, изменения избранного,
+    корзины и подписок — только пользователю user. Курсор клиента —
+    sequence: номер выдаётся после фиксации записи, см. services.changes.
+    """
+
+    RECIPE = 'recipe'
+    INGREDIENT_IN_RECIPE = 'ingredient_in_recipe'
+    FAVORITE = 'favorite'
+    SHOPPING_CART = 'shopping_cart'
+    SUBSCRIPTION = 'subscription'
+    KINDS = (
+        (RECIPE, 'Рецепт'),
+        (INGREDIENT_IN_RECIPE, 'Ингредиент в рецепте'),
+        (FAVORITE, 'Избранное'),
+        (SHOPPING_CART, 'Список покупок'),
+        (SUBSCRIPTION, 'Подписка'),
+    )
+
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTIONS = (
+        (UPSERT, 'Создание или изменение'),
+        (DELETE, 'Удаление'),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(
+        verbose_name='Сущность',
+        max_length=32,
+        choices=KINDS
+    )
+    object_id = models.CharField(
+        verbose_name='Ключ объекта',
+        max_length=64
+    )
+    action = models.CharField(
+        verbose_name='Действие',
+        max_length=8,
+        choices=ACTIONS
+    )
+    user = models.ForeignKey(
+        CustomUser,
+        verbose_name='Владелец изменения',
+        related_name='changes',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    data = models.JSONField(
+        verbose_name='Данные',
+        null=True,
+        blank=True
+    )
+    created = models.DateTimeField(
+        verbose_name='Время изменения',
+        auto_now_add=True,
+        db_index=True
+    )
+    sequence = models.BigIntegerField(
+        verbose_name='Номер в журнале',
+        null=True,
+        blank=True,
+        unique=True
+    )
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(
+                fields=['user', 'sequence'],
+                name='change_user_sequence_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.action} {self.kind} {self.object_id}'
+
+
+class RecipeSimilarity(models.Model):
+    """Похожие рецепты по составу ингредиентов.
+
+    neighbours — упакованный массив пар (id рецепта, коэффициент
+    Жаккара) по убыванию сходства, см. services.similarity.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='similarity',
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    neighbours = models.BinaryField(verbose_name='Похожие рецепты')
+    updated = models.DateTimeField(
+        verbose_name='Время расчёта',
+        auto_now=True
+    )
+
+    def __str__(self):
+        return f'Похожие на {self.recipe_id}'
+
+
+class RecipeActivity(models.Model):
+    """Суточная сводка добавлений рецепта в избранное и покупки.
+
+    Пополняется при каждом добавлении и пересобирается командой
+    rebuild_trending, см. services.trending.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='activity',
+        on_delete=models.CASCADE
+    )
+    day = models.DateField(verbose_name='День (UTC)')
+    favorite_adds = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0
+    )
+    cart_adds = models.PositiveIntegerField(
+        verbose_name='Добавлений в покупки',
+        default=0
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'day'],
+                name='unique_recipe_activity_day'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['day', 'recipe'],
+                name='recipe_activity_day_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} за {self.day}'
+
+
+class TimelineEntry(models.Model):
+    """Рецепт в ленте подписок пользователя.
+
+    Рецепты авторов с числом подписчиков меньше TIMELINE_PULL_FOLLOWERS
+    раскладываются по лентам подписчиков при публикации. Для рецептов
+    остальных авторов создаётся одна запись без пользователя, такие
+    записи подмешиваются при чтении ленты, см. services.timeline.
+    """
+
+    user = models.ForeignKey(
+        CustomUser,
+        verbose_name='Подписчик',
+        related_name='timeline',
+        on_delete=models.CASCADE,
+        null=True
+    )
+    author = models.ForeignKey(
+        CustomUser,
+        verbose_name='Автор рецепта',
+        related_name='timeline_recipes',
+        on_delete=models.CASCADE
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='timeline_entries',
+        on_delete=models.CASCADE
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_timeline_entry'
+            ),
+            models.UniqueConstraint(
+                fields=['recipe'],
+                condition=models.Q(user__isnull=True),
+                name='unique_timeline_pulled_recipe'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'
+            ),
+            models.Index(
+                fields=['author', 'recipe'],
+                condition=models.Q(user__isnull=True),
+                name='timeline_pulled_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} в ленте {self.user_id}'
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def get_estimated_count(queryset) -> int:
+    """Возвращает число строк таблицы по статистике PostgreSQL
+    или None, если оценка недоступна.
+    """
+
+    connection = connections[queryset.db]
+
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table]
+        )
+        row = cursor.fetchone()
+
+    if row is None or row[0] < 0:
+        return None
+
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор админки для больших таблиц.
+
+    Для выборки без фильтров число строк берётся из статистики
+    PostgreSQL вместо COUNT(*), если оно не меньше
+    ADMIN_ESTIMATED_COUNT_THRESHOLD. Отфильтрованные выборки
+    считаются точно.
+    """
+
+    @cached_property
+    def count(self) -> int:
+        query = getattr(self.object_list, 'query', None)
+
+        if query is not None and not query.where:
+            estimate = get_estimated_count(self.object_list)
+
+            if (
+                estimate is not None
+                and estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD
+            ):
+                return estimate
+
+        return super().count
@@ -0,0 +1,194 @@
+from functools import partial
+
+from django.db import connections, router, transaction
+from django.db.models import F, Max, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from recipes.models import Change, Recipe
+
+# Ключ pg_advisory_xact_lock, под которым нумеруются изменения.
+SEQUENCE_LOCK_KEY = 4103817
+
+
+def get_recipe_data(recipe: Recipe) -> dict:
+    """Компактное представление рецепта для журнала изменений."""
+
+    return {
+        'name': recipe.name,
+        'text': recipe.text,
+        'image': recipe.image.name if recipe.image else None,
+        'cooking_time': recipe.cooking_time,
+        'author': recipe.author_id,
+        'tags': sorted(tag.id for tag in recipe.tags.all()),
+    }
+
+
+def assign_sequence() -> None:
+    """Нумерует зафиксированные изменения без номера в порядке id.
+
+    Номера выдаются одним запросом и больше всех выданных раньше,
+    в PostgreSQL — под блокировкой, SQLite и так выполняет записи
+    по одной. Запись транзакции, которая фиксировалась дольше
+    соседних, получает номер после них, поэтому клиент с курсором
+    её не пропустит. Запись, номер которой не успели выдать из-за
+    сбоя процесса, нумерует следующая транзакция с изменениями.
+    """
+
+    using = router.db_for_write(Change)
+    connection = connections[using]
+    pending = Change.objects.using(using).filter(sequence__isnull=True)
+    last = Change.objects.filter(sequence__isnull=False).order_by(
+        '-sequence'
+    ).values('sequence')[:1]
+    first = pending.order_by('id').values('id')[:1]
+    update = partial(
+        pending.update,
+        sequence=F('id') + Greatest(
+            Coalesce(Subquery(last), 0) - Subquery(first) + 1, 0
+        )
+    )
+
+    if connection.vendor != 'postgresql':
+        update()
+        return
+
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_advisory_xact_lock(%s)', [SEQUENCE_LOCK_KEY]
+            )
+
+        update()
+
+
+def schedule_sequence() -> None:
+    """Откладывает assign_sequence до фиксации транзакции,
+    один раз на транзакцию.
+    """
+
+    connection = connections[router.db_for_write(Change)]
+
+    if not any(
+        callback[1] is assign_sequence
+        for callback in connection.run_on_commit
+    ):
+        transaction.on_commit(assign_sequence, using=connection.alias)
+
+
+def record_changes(changes) -> None:
+    """Добавляет изменения в журнал одним запросом и нумерует их
+    после фиксации транзакции.
+
+    Каждое изменение — (сущность, ключ, действие, id владельца, данные),
+    для общих изменений id владельца — None.
+    """
+
+    Change.objects.bulk_create([
+        Change(
+            kind=kind,
+            object_id=str(object_id),
+            action=action,
+            user_id=user_id,
+            data=data
+        )
+        for kind, object_id, action, user_id, data in changes
+    ])
+    schedule_sequence()
+
+
+def record_change(kind, object_id, action, user_id=None, data=None) -> None:
+    """Добавляет одно изменение в журнал."""
+
+    record_changes([(kind, object_id, action, user_id, data)])
+
+
+def record_recipe_upsert(recipe: Recipe, ingredients, removed=()) -> None:
+    """Записывает создание или изменение рецепта.
+
+    ingredients — пары (id ингредиента, количество) нового состава,
+    removed — id ингредиентов, убранных из рецепта.
+    """
+
+    changes = [(
+        Change.RECIPE, recipe.id, Change.UPSERT, None, get_recipe_data(recipe)
+    )]
+    changes += [
+        (
+            Change.INGREDIENT_IN_RECIPE,
+            f'{recipe.id}:{ingredient_id}',
+            Change.DELETE,
+            None,
+            None
+        )
+        for ingredient_id in removed
+    ]
+    changes += [
+        (
+            Change.INGREDIENT_IN_RECIPE,
+            f'{recipe.id}:{ingredient_id}',
+            Change.UPSERT,
+            None,
+            {
+                'recipe': recipe.id,
+                'ingredient': ingredient_id,
+                'amount': amount,
+            }
+        )
+        for ingredient_id, amount in ingredients
+    ]
+    record_changes(changes)
+
+
+def get_visible_changes(user):
+    """Изменения, которые видит пользователь: общие и его личные."""
+
+    if not user.is_authenticated:
+        return Change.objects.filter(user__isnull=True)
+
+    return Change.objects.filter(Q(user__isnull=True) | Q(user=user))
+
+
+def get_latest_cursor() -> int:
+    """Возвращает курсор, с которого начинается синхронизация."""
+
+    return Change.objects.aggregate(
+        latest=Max('sequence')
+    )['latest'] or 0
+
+
+def get_changes_since(user, cursor: int, limit: int) -> tuple:
+    """Возвращает изменения после курсора, свёрнутые до последнего
+    действия по каждому объекту, новый курсор и признак продолжения.
+
+    Курсор — номер изменения: записи без номера ещё не отдаются.
+    """
+
+    rows = list(
+        get_visible_changes(user).filter(
+            sequence__gt=cursor
+        ).order_by('sequence').values(
+            'sequence', 'kind', 'object_id', 'action', 'data'
+        )[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    latest = {}
+
+    for row in rows:
+        latest.pop((row['kind'], row['object_id']), None)
+        latest[(row['kind'], row['object_id'])] = row
+
+    changes = []
+
+    for row in latest.values():
+        change = {
+            'kind': row['kind'],
+            'id': row['object_id'],
+            'action': row['action'],
+        }
+
+        if row['action'] == Change.UPSERT:
+            change['data'] = row['data']
+
+        changes.append(change)
+
+    return changes, rows[-1]['sequence'] if rows else cursor, has_more
@@ -0,0 +1,237 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import router, transaction
+from recipes.models import (Change, Favorite, IngredientInRecipe, Recipe,
+                            RecipeActivity, ShoppingCart, TimelineEntry)
+from services import changes, jobs
+from users.models import CustomUser, Subscription
+
+
+def delete_in_chunks(queryset, fields=(), on_chunk=None) -> int:
+    """Удаляет строки queryset пачками по DELETION_CHUNK_SIZE
+    в порядке первичного ключа, не загружая объекты моделей.
+
+    Сигналы и Collector не вызываются. on_chunk получает значения
+    fields удаляемых строк и выполняется в транзакции пачки.
+    Возвращает число удалённых строк.
+    """
+
+    model = queryset.model
+    using = router.db_for_write(model)
+    size = settings.DELETION_CHUNK_SIZE
+    last_pk = None
+    deleted = 0
+
+    while True:
+        chunk = queryset.using(using).order_by('pk')
+
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+
+        rows = list(chunk.values_list('pk', *fields)[:size])
+
+        if not rows:
+            break
+
+        batch = model.objects.filter(pk__in=[row[0] for row in rows])
+
+        if on_chunk is None:
+            batch._raw_delete(using)
+        else:
+            with transaction.atomic(using=using):
+                on_chunk([row[1:] for row in rows])
+                batch._raw_delete(using)
+
+        deleted += len(rows)
+        last_pk = rows[-1][0]
+
+        if len(rows) < size:
+            break
+
+    return deleted
+
+
+def delete_orphaned_images(names) -> None:
+    """Удаляет файлы изображений, на которые не ссылается
+    ни один рецепт.
+    """
+
+    used = set(
+        Recipe.objects.filter(image__in=names).values_list('image', flat=True)
+    )
+
+    for name in set(names) - used:
+        default_storage.delete(name)
+
+
+def get_ingredient_tombstones(rows) -> list:
+    return [
+        (
+            Change.INGREDIENT_IN_RECIPE,
+            f'{recipe_id}:{ingredient_id}',
+            Change.DELETE,
+            None,
+            None
+        )
+        for recipe_id, ingredient_id in rows
+    ]
+
+
+def get_list_tombstones(kind, rows) -> list:
+    return [
+        (kind, recipe_id, Change.DELETE, user_id, None)
+        for user_id, recipe_id in rows
+    ]
+
+
+def record_ingredient_tombstones(rows) -> None:
+    changes.record_changes(get_ingredient_tombstones(rows))
+
+
+def record_list_tombstones(kind):
+    """Записывает удаление рецептов из личных списков пользователей."""
+
+    def record(rows):
+        changes.record_changes(get_list_tombstones(kind, rows))
+
+    return record
+
+
+def delete_recipes(recipe_ids) -> None:
+    """Удаляет рецепты вместе со связанными строками пачками
+    в одной транзакции: при сбое не остаётся рецептов без состава
+    и тегов. delete_recipes_in_chunks передаёт рецепты частями
+    по DELETION_CHUNK_SIZE, поэтому транзакция остаётся короткой.
+
+    В журнал изменений записываются удаления рецептов, их состава
+    и записей избранного и корзин. Изображения, оставшиеся без
+    рецептов, удаляются после фиксации.
+    """
+
+    recipe_ids = list(recipe_ids)
+
+    with transaction.atomic():
+        images = [
+            image
+            for image in Recipe.objects.filter(
+                id__in=recipe_ids
+            ).values_list('image', flat=True)
+            if image
+        ]
+        delete_in_chunks(
+            IngredientInRecipe.objects.filter(recipe_id__in=recipe_ids),
+            ('recipe_id', 'ingredient_id'),
+            record_ingredient_tombstones
+        )
+        delete_in_chunks(
+            Favorite.objects.filter(recipe_id__in=recipe_ids),
+            ('user_id', 'recipe_id'),
+            record_list_tombstones(Change.FAVORITE)
+        )
+        delete_in_chunks(
+            ShoppingCart.objects.filter(recipe_id__in=recipe_ids),
+            ('user_id', 'recipe_id'),
+            record_list_tombstones(Change.SHOPPING_CART)
+        )
+        delete_in_chunks(
+            Recipe.tags.through.objects.filter(recipe_id__in=recipe_ids)
+        )
+        delete_in_chunks(
+            RecipeActivity.objects.filter(recipe_id__in=recipe_ids)
+        )
+        delete_in_chunks(
+            TimelineEntry.objects.filter(recipe_id__in=recipe_ids)
+        )
+        changes.record_changes([
+            (Change.RECIPE, recipe_id, Change.DELETE, None, None)
+            for recipe_id in recipe_ids
+        ])
+        Recipe.objects.filter(id__in=recipe_ids).delete()
+        transaction.on_commit(lambda: delete_orphaned_images(images))
+
+
+def delete_recipe(recipe: Recipe) -> None:
+    """Удаляет один рецепт через Collector: связанных строк у рецепта
+    немного, и пачки дали бы лишние запросы. В журнал изменений
+    записываются те же удаления, что и в delete_recipes.
+    """
+
+    image = recipe.image.name
+
+    with transaction.atomic():
+        tombstones = [(Change.RECIPE, recipe.id, Change.DELETE, None, None)]
+        tombstones += get_ingredient_tombstones(
+            IngredientInRecipe.objects.filter(
+                recipe=recipe
+            ).values_list('recipe_id', 'ingredient_id')
+        )
+
+        for kind, model in (
+            (Change.FAVORITE, Favorite),
+            (Change.SHOPPING_CART, ShoppingCart),
+        ):
+            tombstones += get_list_tombstones(
+                kind,
+                model.objects.filter(
+                    recipe=recipe
+                ).values_list('user_id', 'recipe_id')
+            )
+
+        changes.record_changes(tombstones)
+        recipe.delete()
+
+        if image:
+            transaction.on_commit(lambda: delete_orphaned_images([image]))
+
+
+def delete_recipes_in_chunks(queryset) -> None:
+    """Удаляет рецепты queryset частями по DELETION_CHUNK_SIZE,
+    каждую в своей транзакции.
+    """
+
+    while True:
+        recipe_ids = list(
+            queryset.order_by('pk').values_list(
+                'pk', flat=True
+            )[:settings.DELETION_CHUNK_SIZE]
+        )
+
+        if not recipe_ids:
+            break
+
+        delete_recipes(recipe_ids)
+
+
+def delete_user(user_id: int) -> None:
+    """Удаляет пользователя, его рецепты, списки и подписки пачками.
+
+    Повторный запуск после сбоя продолжает удаление с места остановки.
+    """
+
+    delete_in_chunks(
+        Subscription.objects.filter(author_id=user_id),
+        ('user_id',),
+        lambda rows: changes.record_changes([
+            (Change.SUBSCRIPTION, user_id, Change.DELETE, subscriber_id, None)
+            for (subscriber_id,) in rows
+        ])
+    )
+    delete_in_chunks(Subscription.objects.filter(user_id=user_id))
+    delete_in_chunks(Favorite.objects.filter(user_id=user_id))
+    delete_in_chunks(ShoppingCart.objects.filter(user_id=user_id))
+    delete_in_chunks(TimelineEntry.objects.filter(user_id=user_id))
+
+    delete_recipes_in_chunks(Recipe.objects.filter(author_id=user_id))
+    delete_in_chunks(Change.objects.filter(user_id=user_id))
+    CustomUser.objects.filter(pk=user_id).delete()
+
+
+def schedule_user_deletion(user: CustomUser) -> None:
+    """Деактивирует пользователя и откладывает удаление его данных
+    в очередь задач.
+    """
+
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        jobs.enqueue(delete_user, args=(user.id,), priority=-10)
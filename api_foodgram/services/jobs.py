@@ -0,0 +1,130 @@
+import datetime
+import traceback
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from jobs.models import Job
+
+
+def get_func_path(func) -> str:
+    """Возвращает путь импорта функции задачи."""
+
+    path = f'{func.__module__}.{func.__qualname__}'
+
+    if '<' in path:
+        raise ValueError(
+            'Отложенной может быть только функция уровня модуля.'
+        )
+
+    return path
+
+
+def enqueue(
+    func,
+    args=(),
+    kwargs=None,
+    priority: int = 0,
+    max_attempts: int = 3,
+    delay: float = 0
+) -> Job:
+    """Ставит вызов функции в очередь отложенных задач.
+
+    Аргументы должны сериализоваться в JSON. Задача становится видна
+    обработчикам после фиксации текущей транзакции. При JOBS_EAGER
+    функция выполняется сразу после фиксации, без обработчиков.
+    """
+
+    path = get_func_path(func)
+    kwargs = kwargs or {}
+
+    if settings.JOBS_EAGER:
+        transaction.on_commit(lambda: func(*args, **kwargs))
+        return None
+
+    return Job.objects.create(
+        func=path,
+        args=list(args),
+        kwargs=kwargs,
+        priority=priority,
+        max_attempts=max_attempts,
+        run_after=timezone.now() + datetime.timedelta(seconds=delay)
+    )
+
+
+def get_visible_jobs(now):
+    """Задачи, которые можно взять: в очереди или брошенные
+    обработчиком после истечения таймаута видимости.
+    """
+
+    return Job.objects.filter(
+        status__in=(Job.QUEUED, Job.RUNNING),
+        run_after__lte=now
+    ).filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    )
+
+
+def claim_job(visibility_timeout: float) -> Job:
+    """Берёт задачу с наибольшим приоритетом.
+
+    Захват выполняется условным UPDATE, поэтому одну задачу
+    не возьмут два обработчика. Если обработчик не завершит задачу
+    за visibility_timeout секунд, её возьмёт другой.
+    """
+
+    now = timezone.now()
+    candidates = get_visible_jobs(now).order_by(
+        '-priority', 'run_after', 'id'
+    ).values_list('id', flat=True)[:10]
+
+    for job_id in candidates:
+        claimed = get_visible_jobs(now).filter(id=job_id).update(
+            status=Job.RUNNING,
+            attempts=F('attempts') + 1,
+            locked_until=now + datetime.timedelta(
+                seconds=visibility_timeout
+            )
+        )
+
+        if claimed:
+            return Job.objects.get(id=job_id)
+
+    return None
+
+
+def run_job(job: Job) -> bool:
+    """Выполняет задачу. Успешная задача удаляется,
+    неуспешная откладывается с экспоненциальной задержкой
+    или помечается как failed после max_attempts попыток.
+    """
+
+    try:
+        import_string(job.func)(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+
+        if job.attempts >= job.max_attempts:
+            Job.objects.filter(id=job.id).update(
+                status=Job.FAILED,
+                locked_until=None,
+                last_error=error
+            )
+        else:
+            Job.objects.filter(id=job.id).update(
+                status=Job.QUEUED,
+                locked_until=None,
+                last_error=error,
+                run_after=timezone.now() + datetime.timedelta(
+                    seconds=settings.JOBS_RETRY_DELAY
+                    * 2 ** (job.attempts - 1)
+                )
+            )
+
+        return False
+
+    Job.objects.filter(id=job.id).delete()
+
+    return True
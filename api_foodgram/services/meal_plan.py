@@ -0,0 +1,174 @@
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+
+
+def get_vector_key(recipe_id: int) -> str:
+    return f'recipes:ingredient_vector:{recipe_id}'
+
+
+class LocalVectorCache:
+    """Ограниченный LRU-кеш векторов процесса со временем жизни записей.
+
+    Используется без MEAL_PLAN_VECTOR_CACHE. Сброс вектора после
+    изменения рецепта действует только в своём процессе, остальные
+    воркеры отдают старый вектор ещё до MEAL_PLAN_LOCAL_CACHE_TTL секунд.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get_many(self, keys) -> dict:
+        now = time.monotonic()
+        found = {}
+
+        with self.lock:
+            for key in keys:
+                entry = self.entries.get(key)
+
+                if entry is None:
+                    continue
+
+                if entry[0] <= now:
+                    del self.entries[key]
+                    continue
+
+                self.entries.move_to_end(key)
+                found[key] = entry[1]
+
+        return found
+
+    def set_many(self, data: dict, timeout=None) -> None:
+        expires = time.monotonic() + settings.MEAL_PLAN_LOCAL_CACHE_TTL
+
+        with self.lock:
+            for key, value in data.items():
+                self.entries[key] = (expires, value)
+                self.entries.move_to_end(key)
+
+            while len(self.entries) > settings.MEAL_PLAN_LOCAL_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+local_vectors = LocalVectorCache()
+
+
+def get_vector_cache():
+    """Общий кеш векторов из MEAL_PLAN_VECTOR_CACHE, без него —
+    кеш процесса.
+    """
+
+    alias = settings.MEAL_PLAN_VECTOR_CACHE
+    return caches[alias] if alias else local_vectors
+
+
+def invalidate_ingredient_vector(recipe_id: int) -> None:
+    """Удаляет вектор ингредиентов рецепта из кеша."""
+
+    get_vector_cache().delete(get_vector_key(recipe_id))
+
+
+def get_ingredient_vectors(recipe_ids) -> dict:
+    """Возвращает разреженные векторы ингредиентов рецептов:
+    {id рецепта: (id ингредиентов, количества)} в виде array('q').
+
+    Векторы берутся из кеша, недостающие собираются одним запросом.
+    Несуществующих рецептов в ответе нет.
+    """
+
+    cache = get_vector_cache()
+    keys = {get_vector_key(recipe_id): recipe_id for recipe_id in recipe_ids}
+    vectors = {
+        keys[key]: (array('q', ingredient_ids), array('q', amounts))
+        for key, (ingredient_ids, amounts) in cache.get_many(keys).items()
+    }
+    missing = set(keys.values()) - vectors.keys()
+
+    if not missing:
+        return vectors
+
+    rows = IngredientInRecipe.objects.filter(
+        recipe_id__in=missing
+    ).order_by('recipe_id', 'ingredient_id').values_list(
+        'recipe_id', 'ingredient_id', 'amount'
+    )
+    built = {}
+
+    for recipe_id, ingredient_id, amount in rows:
+        ingredient_ids, amounts = built.setdefault(
+            recipe_id, (array('q'), array('q'))
+        )
+        ingredient_ids.append(ingredient_id)
+        amounts.append(amount)
+
+    empty = missing - built.keys()
+
+    if empty:
+        for recipe_id in Recipe.objects.filter(
+            id__in=empty
+        ).values_list('id', flat=True):
+            built[recipe_id] = (array('q'), array('q'))
+
+    cache.set_many(
+        {
+            get_vector_key(recipe_id): (
+                ingredient_ids.tobytes(), amounts.tobytes()
+            )
+            for recipe_id, (ingredient_ids, amounts) in built.items()
+        },
+        settings.MEAL_PLAN_VECTOR_TTL
+    )
+    vectors.update(built)
+
+    return vectors
+
+
+def get_meal_plan(plan: dict) -> tuple:
+    """Считает список покупок для плана {id рецепта: множитель}
+    суммой векторов ингредиентов.
+
+    Возвращает список ингредиентов, отсортированный по названию,
+    и отсортированный список id несуществующих рецептов.
+    """
+
+    vectors = get_ingredient_vectors(plan)
+    missing = sorted(set(plan) - vectors.keys())
+
+    if missing:
+        return [], missing
+
+    totals = {}
+
+    for recipe_id, (ingredient_ids, amounts) in vectors.items():
+        multiplier = plan[recipe_id]
+
+        for ingredient_id, amount in zip(ingredient_ids, amounts):
+            totals[ingredient_id] = (
+                totals.get(ingredient_id, 0) + amount * multiplier
+            )
+
+    shopping_list = [
+        {
+            'id': ingredient_id,
+            'name': name,
+            'measurement_unit': measurement_unit,
+            'amount': totals[ingredient_id],
+        }
+        for ingredient_id, name, measurement_unit in Ingredient.objects.filter(
+            id__in=totals
+        ).order_by('name', 'id').values_list(
+            'id', 'name', 'measurement_unit'
+        )
+    ]
+
+    return shopping_list, missing
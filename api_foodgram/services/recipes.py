@@ -1,5 +1,9 @@
-from recipes.models import Recipe
-from users.models import CustomUser
+from django.db import NotSupportedError, connections, router
+from django.db.models import Prefetch
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, Tag)
+from services.users import annotate_user_flags, get_users_with_subscription
+from users.models import CustomUser, Subscription
 
 
 def get_all_recipes() -> Recipe:
@@ -12,3 +16,231 @@ def get_user_recipes(obj: CustomUser) -> Recipe:
     """Возвращает все рецепты пользователя."""
 
     return obj.recipes.all()
+
+
+def get_recipes_for_read(
+    user: CustomUser,
+    fields: set = None,
+    expand: set = frozenset()
+) -> Recipe:
+    """Возвращает рецепты со связями для RecipeReadSerializer.
+
+    fields — запрошенные поля (None — все), expand — связи,
+    которые выводятся целиком, а не первичными ключами.
+    Незапрошенные столбцы, связи и признаки не загружаются.
+    """
+
+    def is_wanted(name):
+        return fields is None or name in fields or name in expand
+
+    def is_expanded(name):
+        return fields is None or name in expand
+
+    queryset = Recipe.objects.defer(*(
+        name
+        for name in ('name', 'text', 'image', 'cooking_time')
+        if not is_wanted(name)
+    ))
+    prefetches = []
+
+    if is_expanded('tags'):
+        prefetches.append('tags')
+    elif is_wanted('tags'):
+        prefetches.append(Prefetch('tags', queryset=Tag.objects.only('id')))
+
+    if is_expanded('author'):
+        prefetches.append(
+            Prefetch('author', queryset=get_users_with_subscription(user))
+        )
+
+    if is_expanded('ingredients'):
+        prefetches.append(Prefetch(
+            'ingredientinrecipe_set',
+            queryset=IngredientInRecipe.objects.select_related('ingredient')
+        ))
+    elif is_wanted('ingredients'):
+        prefetches.append(Prefetch(
+            'ingredientinrecipe_set',
+            queryset=IngredientInRecipe.objects.only(
+                'id', 'recipe_id', 'ingredient_id'
+            )
+        ))
+
+    flags = {
+        name: flag
+        for name, flag in (
+            ('is_favorited', (Favorite, 'user', 'recipe')),
+            ('is_in_shopping_cart', (ShoppingCart, 'user', 'recipe')),
+        )
+        if is_wanted(name)
+    }
+
+    return annotate_user_flags(
+        queryset.prefetch_related(*prefetches), user, **flags
+    )
+
+
+RECIPE_DOCUMENT_SQL = {
+    'postgresql': '''
+        SELECT json_build_object(
+            'id', r.id,
+            'tags', COALESCE((
+                SELECT json_agg(json_build_object(
+                    'id', t.id,
+                    'name', t.name,
+                    'color', t.color,
+                    'slug', t.slug
+                ) ORDER BY t.id)
+                FROM {recipe_tags} rt
+                JOIN {tag} t ON t.id = rt.tag_id
+                WHERE rt.recipe_id = r.id
+            ), '[]'::json),
+            'author', json_build_object(
+                'email', u.email,
+                'id', u.id,
+                'username', u.username,
+                'first_name', u.first_name,
+                'last_name', u.last_name,
+                'is_subscribed', EXISTS(
+                    SELECT 1 FROM {subscription} s
+                    WHERE s.user_id = %s AND s.author_id = u.id
+                )
+            ),
+            'ingredients', COALESCE((
+                SELECT json_agg(json_build_object(
+                    'id', i.id,
+                    'name', i.name,
+                    'measurement_unit', i.measurement_unit,
+                    'amount', ir.amount
+                ) ORDER BY ir.id)
+                FROM {ingredient_in_recipe} ir
+                JOIN {ingredient} i ON i.id = ir.ingredient_id
+                WHERE ir.recipe_id = r.id
+            ), '[]'::json),
+            'is_favorited', EXISTS(
+                SELECT 1 FROM {favorite} f
+                WHERE f.user_id = %s AND f.recipe_id = r.id
+            ),
+            'is_in_shopping_cart', EXISTS(
+                SELECT 1 FROM {shopping_cart} c
+                WHERE c.user_id = %s AND c.recipe_id = r.id
+            ),
+            'name', r.name,
+            'image', CASE WHEN r.image = '' THEN NULL
+                     ELSE %s || r.image END,
+            'text', r.text,
+            'cooking_time', r.cooking_time
+        )::text
+        FROM {recipe} r
+        JOIN {user} u ON u.id = r.author_id
+        WHERE r.id = %s
+    ''',
+    'sqlite': '''
+        SELECT json_object(
+            'id', r.id,
+            'tags', json((
+                SELECT json_group_array(json_object(
+                    'id', t.id,
+                    'name', t.name,
+                    'color', t.color,
+                    'slug', t.slug
+                ))
+                FROM (
+                    SELECT t.* FROM {recipe_tags} rt
+                    JOIN {tag} t ON t.id = rt.tag_id
+                    WHERE rt.recipe_id = r.id
+                    ORDER BY t.id
+                ) t
+            )),
+            'author', json_object(
+                'email', u.email,
+                'id', u.id,
+                'username', u.username,
+                'first_name', u.first_name,
+                'last_name', u.last_name,
+                'is_subscribed', json(CASE WHEN EXISTS(
+                    SELECT 1 FROM {subscription} s
+                    WHERE s.user_id = %s AND s.author_id = u.id
+                ) THEN 'true' ELSE 'false' END)
+            ),
+            'ingredients', json((
+                SELECT json_group_array(json_object(
+                    'id', ir.ingredient_id,
+                    'name', ir.name,
+                    'measurement_unit', ir.measurement_unit,
+                    'amount', ir.amount
+                ))
+                FROM (
+                    SELECT ir.ingredient_id, i.name, i.measurement_unit,
+                           ir.amount
+                    FROM {ingredient_in_recipe} ir
+                    JOIN {ingredient} i ON i.id = ir.ingredient_id
+                    WHERE ir.recipe_id = r.id
+                    ORDER BY ir.id
+                ) ir
+            )),
+            'is_favorited', json(CASE WHEN EXISTS(
+                SELECT 1 FROM {favorite} f
+                WHERE f.user_id = %s AND f.recipe_id = r.id
+            ) THEN 'true' ELSE 'false' END),
+            'is_in_shopping_cart', json(CASE WHEN EXISTS(
+                SELECT 1 FROM {shopping_cart} c
+                WHERE c.user_id = %s AND c.recipe_id = r.id
+            ) THEN 'true' ELSE 'false' END),
+            'name', r.name,
+            'image', CASE WHEN r.image = '' THEN NULL
+                     ELSE %s || r.image END,
+            'text', r.text,
+            'cooking_time', r.cooking_time
+        )
+        FROM {recipe} r
+        JOIN {user} u ON u.id = r.author_id
+        WHERE r.id = %s
+    ''',
+}
+
+
+def supports_recipe_document() -> bool:
+    """Проверяет, умеет ли СУБД чтения собирать JSON рецепта."""
+
+    return connections[
+        router.db_for_read(Recipe)
+    ].vendor in RECIPE_DOCUMENT_SQL
+
+
+def get_recipe_document(
+    recipe_id: int, user: CustomUser, media_url: str
+) -> str:
+    """Собирает JSON рецепта в форме RecipeReadSerializer
+    одним SQL-запросом. Возвращает None, если рецепт не найден.
+    Для других СУБД, см. supports_recipe_document, поднимает
+    NotSupportedError.
+    """
+
+    connection = connections[router.db_for_read(Recipe)]
+    sql = RECIPE_DOCUMENT_SQL.get(connection.vendor)
+
+    if sql is None:
+        raise NotSupportedError(
+            f'JSON рецепта не собирается в {connection.vendor}.'
+        )
+
+    sql = sql.format(
+        recipe=Recipe._meta.db_table,
+        recipe_tags=Recipe.tags.through._meta.db_table,
+        tag=Tag._meta.db_table,
+        ingredient_in_recipe=IngredientInRecipe._meta.db_table,
+        ingredient=Ingredient._meta.db_table,
+        user=CustomUser._meta.db_table,
+        subscription=Subscription._meta.db_table,
+        favorite=Favorite._meta.db_table,
+        shopping_cart=ShoppingCart._meta.db_table,
+    )
+    user_id = None if user.is_anonymous else user.pk
+    params = (user_id, user_id, user_id, media_url, recipe_id)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+
+    return row[0] if row else None
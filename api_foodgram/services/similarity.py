@@ -0,0 +1,268 @@
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from recipes.models import IngredientInRecipe, Recipe, RecipeSimilarity
+from services import jobs
+
+NEIGHBOUR_DTYPE = np.dtype([('id', '<i4'), ('score', '<f4')])
+
+
+def pack_neighbours(ids, scores) -> bytes:
+    """Упаковывает соседей в 8 байт на рецепт."""
+
+    packed = np.empty(len(ids), dtype=NEIGHBOUR_DTYPE)
+    packed['id'] = ids
+    packed['score'] = scores
+
+    return packed.tobytes()
+
+
+def unpack_neighbours(data: bytes) -> np.ndarray:
+    """Распаковывает соседей из RecipeSimilarity.neighbours."""
+
+    return np.frombuffer(bytes(data), dtype=NEIGHBOUR_DTYPE)
+
+
+def select_top(ids: np.ndarray, scores: np.ndarray, k: int) -> tuple:
+    """Возвращает k соседей с наибольшим сходством больше нуля,
+    при равенстве — с меньшим id.
+    """
+
+    positive = scores > 0
+    ids, scores = ids[positive], scores[positive]
+
+    if len(scores) > k:
+        threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+        kept = scores >= threshold
+        ids, scores = ids[kept], scores[kept]
+
+    order = np.lexsort((ids, -scores))[:k]
+
+    return ids[order], scores[order]
+
+
+class IngredientMatrix:
+    """Разреженная матрица рецепт × ингредиент из IngredientInRecipe.
+
+    Хранится в виде двух индексов: ингредиенты каждого рецепта
+    и рецепты каждого ингредиента (списки вхождений).
+    """
+
+    def __init__(self):
+        pairs = np.array(
+            IngredientInRecipe.objects.order_by().values_list(
+                'recipe_id', 'ingredient_id'
+            ),
+            dtype=np.int64
+        ).reshape(-1, 2)
+        self.recipe_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+        _, columns = np.unique(pairs[:, 1], return_inverse=True)
+        self.sizes = np.bincount(rows, minlength=len(self.recipe_ids))
+        self.recipe_start = np.concatenate(([0], np.cumsum(self.sizes)))
+        self.recipe_columns = columns[np.argsort(rows, kind='stable')]
+        self.postings = np.bincount(columns)
+        self.posting_start = np.concatenate(([0], np.cumsum(self.postings)))
+        self.posting_rows = rows[np.argsort(columns, kind='stable')]
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def get_block_scores(self, start: int, stop: int) -> np.ndarray:
+        """Коэффициенты Жаккара рецептов [start, stop) со всеми.
+
+        Пересечения считаются одним bincount по парам, полученным
+        развёрткой списков вхождений ингредиентов блока.
+        """
+
+        count = len(self)
+        block_sizes = self.sizes[start:stop]
+        block_rows = np.repeat(np.arange(stop - start), block_sizes)
+        columns = self.recipe_columns[
+            self.recipe_start[start]:self.recipe_start[stop]
+        ]
+        lengths = self.postings[columns]
+        offsets = np.repeat(
+            self.posting_start[columns] - np.cumsum(lengths) + lengths,
+            lengths
+        )
+        others = self.posting_rows[offsets + np.arange(lengths.sum())]
+        shared = np.bincount(
+            np.repeat(block_rows, lengths) * count + others,
+            minlength=(stop - start) * count
+        ).reshape(stop - start, count)
+        union = block_sizes[:, None] + self.sizes[None, :] - shared
+        scores = np.divide(
+            shared,
+            union,
+            out=np.zeros(shared.shape, dtype=np.float32),
+            where=shared > 0,
+            casting='unsafe'
+        )
+        scores[np.arange(stop - start), np.arange(start, stop)] = 0
+
+        return scores
+
+
+def save_neighbours(rows: dict) -> None:
+    """Сохраняет соседей {id рецепта: упакованные соседи}."""
+
+    with transaction.atomic():
+        RecipeSimilarity.objects.filter(recipe_id__in=rows).delete()
+        RecipeSimilarity.objects.bulk_create(
+            RecipeSimilarity(recipe_id=recipe_id, neighbours=neighbours)
+            for recipe_id, neighbours in rows.items()
+        )
+
+
+def build_index(k: int = None, block_cells: int = None) -> int:
+    """Пересчитывает соседей всех рецептов блоками.
+
+    Блок берёт столько рецептов, чтобы его матрица сходства со всеми
+    рецептами занимала не больше block_cells ячеек.
+    Возвращает число рецептов в индексе.
+    """
+
+    k = k or settings.SIMILAR_RECIPES_K
+    block_cells = block_cells or settings.SIMILARITY_BLOCK_CELLS
+    matrix = IngredientMatrix()
+    count = len(matrix)
+    block = max(1, block_cells // max(count, 1))
+
+    for start in range(0, count, block):
+        stop = min(start + block, count)
+        scores = matrix.get_block_scores(start, stop)
+        rows = {}
+
+        for offset, row_scores in enumerate(scores):
+            ids, top_scores = select_top(matrix.recipe_ids, row_scores, k)
+            rows[int(matrix.recipe_ids[start + offset])] = pack_neighbours(
+                ids, top_scores
+            )
+
+        save_neighbours(rows)
+
+    RecipeSimilarity.objects.exclude(recipe_id__in=Recipe.objects.filter(
+        ingredientinrecipe__isnull=False
+    )).delete()
+
+    return count
+
+
+def get_candidates(recipe_id: int) -> tuple:
+    """Рецепты с общими ингредиентами и их сходство с recipe_id.
+    Пересечения и размеры составов считаются в СУБД.
+    """
+
+    ingredient_ids = IngredientInRecipe.objects.filter(
+        recipe_id=recipe_id
+    ).values('ingredient_id')
+    sizes = IngredientInRecipe.objects.filter(
+        recipe_id=OuterRef('pk')
+    ).order_by().values('recipe_id').annotate(
+        count=Count('pk')
+    ).values('count')
+    rows = np.array(
+        Recipe.objects.filter(
+            ingredientinrecipe__ingredient_id__in=ingredient_ids
+        ).exclude(id=recipe_id).order_by().values('id').annotate(
+            shared=Count('ingredientinrecipe'),
+            size=Subquery(sizes)
+        ).values_list('id', 'shared', 'size'),
+        dtype=np.int64
+    ).reshape(-1, 3)
+    size = IngredientInRecipe.objects.filter(recipe_id=recipe_id).count()
+    union = size + rows[:, 2] - rows[:, 1]
+
+    return rows[:, 0], (rows[:, 1] / np.maximum(union, 1)).astype(np.float32)
+
+
+def merge_neighbour(data: bytes, recipe_id: int, score: float, k: int):
+    """Вставляет или обновляет соседа в упакованном списке.
+    Возвращает новый список или None, если он не изменился.
+    """
+
+    current = unpack_neighbours(data)
+    kept = current[current['id'] != recipe_id]
+    ids, scores = select_top(
+        np.append(kept['id'], recipe_id),
+        np.append(kept['score'], np.float32(score)),
+        k
+    )
+    merged = pack_neighbours(ids, scores)
+
+    return None if merged == bytes(data) else merged
+
+
+def update_recipe(recipe_id: int) -> None:
+    """Пересчитывает соседей рецепта и добавляет рецепт в списки
+    тех, в чей топ он теперь входит.
+
+    Рецепты, которые перестали иметь с ним общие ингредиенты,
+    не пересчитываются: их списки уточнит следующий build_index.
+    """
+
+    k = settings.SIMILAR_RECIPES_K
+
+    if not Recipe.objects.filter(id=recipe_id).exists():
+        return
+
+    candidate_ids, scores = get_candidates(recipe_id)
+    save_neighbours({recipe_id: pack_neighbours(*select_top(
+        candidate_ids, scores, k
+    ))})
+    scores_by_id = dict(zip(candidate_ids.tolist(), scores.tolist()))
+    chunk_size = settings.SIMILARITY_UPDATE_CHUNK_SIZE
+
+    for start in range(0, len(candidate_ids), chunk_size):
+        changed = []
+
+        for row in RecipeSimilarity.objects.filter(
+            recipe_id__in=candidate_ids[start:start + chunk_size].tolist()
+        ):
+            merged = merge_neighbour(
+                row.neighbours, recipe_id, scores_by_id[row.recipe_id], k
+            )
+
+            if merged is not None:
+                row.neighbours = merged
+                changed.append(row)
+
+        RecipeSimilarity.objects.bulk_update(changed, ('neighbours',))
+
+
+def schedule_recipe_update(recipe_id: int) -> None:
+    """Ставит пересчёт соседей рецепта в очередь задач."""
+
+    jobs.enqueue(update_recipe, args=(recipe_id,), priority=-5)
+
+
+def get_similar_recipes(recipe_id: int) -> list:
+    """Возвращает похожие рецепты из индекса с атрибутом score
+    или None, если рецепта нет. Сходство не вычисляется.
+    """
+
+    data = RecipeSimilarity.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('neighbours', flat=True).first()
+
+    if data is None:
+        if Recipe.objects.filter(id=recipe_id).exists():
+            return []
+
+        return None
+
+    neighbours = unpack_neighbours(data)
+    found = Recipe.objects.only(
+        'id', 'name', 'image', 'cooking_time'
+    ).in_bulk(neighbours['id'].tolist())
+    similar = []
+
+    for neighbour_id, score in neighbours.tolist():
+        recipe = found.get(neighbour_id)
+
+        if recipe is not None:
+            recipe.score = round(score, 4)
+            similar.append(recipe)
+
+    return similar
@@ -0,0 +1,191 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from recipes.models import Recipe, TimelineEntry
+from services import jobs
+from users.models import Subscription
+
+
+def push_to_followers(recipe_id: int, author_id: int) -> int:
+    """Добавляет рецепт в ленты подписчиков автора пачками
+    по TIMELINE_FANOUT_CHUNK_SIZE. Возвращает число подписчиков.
+    """
+
+    size = settings.TIMELINE_FANOUT_CHUNK_SIZE
+    last_user_id = 0
+    pushed = 0
+
+    while True:
+        user_ids = list(
+            Subscription.objects.filter(
+                author_id=author_id,
+                user_id__gt=last_user_id
+            ).order_by('user_id').values_list('user_id', flat=True)[:size]
+        )
+
+        if not user_ids:
+            break
+
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(
+                    user_id=user_id, author_id=author_id, recipe_id=recipe_id
+                )
+                for user_id in user_ids
+            ),
+            ignore_conflicts=True
+        )
+        pushed += len(user_ids)
+        last_user_id = user_ids[-1]
+
+        if len(user_ids) < size:
+            break
+
+    return pushed
+
+
+def fan_out_recipe(recipe_id: int) -> None:
+    """Раскладывает новый рецепт по лентам подписчиков автора.
+
+    Рецепт автора, у которого не меньше TIMELINE_PULL_FOLLOWERS
+    подписчиков, записывается один раз без пользователя и подмешивается
+    в ленты при чтении. Повторный запуск не создаёт дублей.
+    """
+
+    author_id = Recipe.objects.filter(
+        id=recipe_id
+    ).values_list('author_id', flat=True).first()
+
+    if author_id is None:
+        return
+
+    followers = Subscription.objects.filter(author_id=author_id)[
+        :settings.TIMELINE_PULL_FOLLOWERS
+    ].count()
+
+    if followers < settings.TIMELINE_PULL_FOLLOWERS:
+        push_to_followers(recipe_id, author_id)
+    else:
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(author_id=author_id, recipe_id=recipe_id)],
+            ignore_conflicts=True
+        )
+
+
+def schedule_fan_out(recipe_id: int) -> None:
+    """Ставит раскладку рецепта по лентам в очередь задач."""
+
+    jobs.enqueue(fan_out_recipe, args=(recipe_id,))
+
+
+def backfill_subscription(user_id: int, author_id: int) -> None:
+    """Добавляет в ленту нового подписчика последние
+    TIMELINE_BACKFILL_SIZE разложенных рецептов автора.
+    Рецепты, которые подмешиваются при чтении, не копируются.
+    """
+
+    if not Subscription.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).exists():
+        return
+
+    recipe_ids = Recipe.objects.filter(author_id=author_id).exclude(
+        id__in=TimelineEntry.objects.filter(
+            user__isnull=True, author_id=author_id
+        ).values('recipe_id')
+    ).order_by('-id').values_list('id', flat=True)[
+        :settings.TIMELINE_BACKFILL_SIZE
+    ]
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id, author_id=author_id, recipe_id=recipe_id
+            )
+            for recipe_id in recipe_ids
+        ),
+        ignore_conflicts=True
+    )
+
+
+def subscribe(user_id: int, author_id: int) -> None:
+    """Откладывает заполнение ленты после подписки."""
+
+    jobs.enqueue(backfill_subscription, args=(user_id, author_id))
+
+
+def unsubscribe(user_id: int, author_id: int) -> None:
+    """Убирает рецепты автора из ленты отписавшегося пользователя."""
+
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def get_timeline(user, before: int = None, limit: int = None) -> tuple:
+    """Возвращает id рецептов ленты по убыванию, начиная с рецепта
+    меньше before, и признак следующей страницы.
+
+    Разложенные записи пользователя и подмешиваемые записи авторов,
+    на которых он подписан, читаются двумя запросами по индексам
+    и сливаются; число строк не зависит от числа подписок.
+    """
+
+    limit = limit or settings.REST_FRAMEWORK['PAGE_SIZE']
+    pushed = TimelineEntry.objects.filter(user=user)
+    pulled = TimelineEntry.objects.filter(
+        user__isnull=True,
+        author_id__in=Subscription.objects.filter(
+            user=user
+        ).values('author_id')
+    )
+
+    if before is not None:
+        pushed = pushed.filter(recipe_id__lt=before)
+        pulled = pulled.filter(recipe_id__lt=before)
+
+    recipe_ids = sorted(
+        {
+            recipe_id
+            for entries in (pushed, pulled)
+            for recipe_id in entries.order_by('-recipe_id').values_list(
+                'recipe_id', flat=True
+            )[:limit + 1]
+        },
+        reverse=True
+    )
+
+    return recipe_ids[:limit], len(recipe_ids) > limit
+
+
+def rebuild_timeline(batch_size: int = 1000) -> int:
+    """Пересобирает ленты по текущим подпискам и рецептам.
+
+    Рецепты авторов с числом подписчиков не меньше
+    TIMELINE_PULL_FOLLOWERS подмешиваются при чтении, ленты подписчиков
+    остальных авторов получают их последние TIMELINE_BACKFILL_SIZE
+    рецептов. Возвращает число записей лент.
+    """
+
+    with transaction.atomic():
+        TimelineEntry.objects.all().delete()
+        pulled_authors = set(
+            Subscription.objects.order_by().values('author_id').annotate(
+                followers=Count('id')
+            ).filter(
+                followers__gte=settings.TIMELINE_PULL_FOLLOWERS
+            ).values_list('author_id', flat=True)
+        )
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(author_id=author_id, recipe_id=recipe_id)
+                for recipe_id, author_id in Recipe.objects.filter(
+                    author_id__in=pulled_authors
+                ).values_list('id', 'author_id').iterator()
+            ),
+            batch_size=batch_size
+        )
+
+        for user_id, author_id in Subscription.objects.exclude(
+            author_id__in=pulled_authors
+        ).values_list('user_id', 'author_id').iterator():
+            backfill_subscription(user_id, author_id)
+
+    return TimelineEntry.objects.count()
@@ -0,0 +1,114 @@
+import datetime
+import re
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from recipes.models import Favorite, Recipe, RecipeActivity, ShoppingCart
+
+FAVORITE_ADDS = 'favorite_adds'
+CART_ADDS = 'cart_adds'
+SOURCES = ((Favorite, FAVORITE_ADDS), (ShoppingCart, CART_ADDS))
+DEFAULT_WINDOW = '7d'
+WINDOW_PATTERN = re.compile(r'^([1-9][0-9]*)d$')
+
+
+def record_add(recipe_id: int, field: str) -> None:
+    """Увеличивает счётчик добавлений рецепта за текущие сутки UTC.
+
+    Вызывается в транзакции добавления, строка сводки создаётся
+    при первом добавлении за сутки.
+    """
+
+    today = timezone.now().date()
+    activity = RecipeActivity.objects.filter(recipe_id=recipe_id, day=today)
+
+    if activity.update(**{field: F(field) + 1}):
+        return
+
+    try:
+        with transaction.atomic():
+            RecipeActivity.objects.create(
+                recipe_id=recipe_id, day=today, **{field: 1}
+            )
+    except IntegrityError:
+        activity.update(**{field: F(field) + 1})
+
+
+def parse_window(value: str) -> int:
+    """Возвращает число суток окна вида 7d или None,
+    если окно задано неверно.
+    """
+
+    match = WINDOW_PATTERN.match(value or '')
+
+    if match is None:
+        return None
+
+    days = int(match.group(1))
+
+    return days if days <= settings.TRENDING_MAX_WINDOW_DAYS else None
+
+
+def order_by_trending(queryset: Recipe, days: int) -> Recipe:
+    """Упорядочивает рецепты по числу добавлений в избранное
+    и покупки за последние days суток.
+
+    Выборка не сужается: рецепты без добавлений в окне получают
+    ноль и идут последними по убыванию id. Считаются только строки
+    сводки из окна по индексу (day, recipe), таблицы избранного
+    и покупок не читаются.
+    """
+
+    since = timezone.now().date() - datetime.timedelta(days=days - 1)
+    window = RecipeActivity.objects.filter(day__gte=since)
+    score = window.filter(
+        recipe_id=OuterRef('pk')
+    ).order_by().values('recipe_id').annotate(
+        score=Sum(F('favorite_adds') + F('cart_adds'))
+    ).values('score')
+
+    return queryset.annotate(
+        trending_score=Coalesce(Subquery(score), 0)
+    ).order_by('-trending_score', '-id')
+
+
+def get_daily_adds(model) -> dict:
+    """Считает добавления по рецептам и суткам UTC.
+    Строки без времени добавления не учитываются.
+    """
+
+    return {
+        (row['recipe_id'], row['day']): row['adds']
+        for row in model.objects.filter(created__isnull=False).annotate(
+            day=TruncDate('created', tzinfo=datetime.timezone.utc)
+        ).order_by().values('recipe_id', 'day').annotate(
+            adds=Count('pk')
+        )
+    }
+
+
+def rebuild_activity(batch_size: int = 1000) -> int:
+    """Пересобирает сводку по времени добавления записей избранного
+    и покупок. Возвращает число строк сводки.
+    """
+
+    rows = {}
+
+    for model, field in SOURCES:
+        for key, adds in get_daily_adds(model).items():
+            rows.setdefault(key, {})[field] = adds
+
+    with transaction.atomic():
+        RecipeActivity.objects.all().delete()
+        RecipeActivity.objects.bulk_create(
+            (
+                RecipeActivity(recipe_id=recipe_id, day=day, **counters)
+                for (recipe_id, day), counters in rows.items()
+            ),
+            batch_size=batch_size
+        )
+
+    return len(rows)
@@ -1,4 +1,6 @@
+from django.db.models import Count, Exists, OuterRef, Prefetch, Value
 from django.shortcuts import get_object_or_404
+from recipes.models import Recipe
 from users.models import CustomUser, Subscription
 
 
@@ -14,10 +16,49 @@ def get_all_users() -> CustomUser:
     return CustomUser.objects.all()
 
 
+def annotate_user_flags(queryset, user: CustomUser, **flags):
+    """Добавляет к выборке булевы признаки связи с пользователем.
+    flags: {имя аннотации: (модель, поле пользователя, поле объекта)}.
+    """
+
+    if user is None or user.is_anonymous:
+        return queryset.annotate(
+            **{name: Value(False) for name in flags}
+        )
+
+    return queryset.annotate(**{
+        name: Exists(model.objects.filter(**{
+            user_field: user,
+            object_field: OuterRef('pk'),
+        }))
+        for name, (model, user_field, object_field) in flags.items()
+    })
+
+
+def get_users_with_subscription(user: CustomUser) -> CustomUser:
+    """Возвращает пользователей с признаком подписки на них."""
+
+    return annotate_user_flags(
+        CustomUser.objects.all(),
+        user,
+        is_subscribed=(Subscription, 'user', 'author')
+    )
+
+
 def get_user_subscriptions(user: CustomUser) -> CustomUser:
     """Возвращает подписки пользователя."""
 
-    return CustomUser.objects.filter(author__user=user)
+    return CustomUser.objects.filter(author__user=user).annotate(
+        is_subscribed=Value(True),
+        recipes_count=Count('recipes', distinct=True)
+    ).prefetch_related(
+        Prefetch(
+            'recipes',
+            queryset=Recipe.objects.only(
+                'id', 'name', 'image', 'cooking_time', 'author_id'
+            )
+        )
+    )
 
 
 def get_author_id(id: int) -> CustomUser:
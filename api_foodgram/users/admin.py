@@ -1,14 +1,33 @@
-from django.contrib.admin import ModelAdmin, register
+from django.contrib.admin import register
+from recipes.admin import LargeTableAdmin
+from services import deletion
 
 from .models import CustomUser, Subscription
 
 
 @register(CustomUser)
-class CustomUserAdmin(ModelAdmin):
+class CustomUserAdmin(LargeTableAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name')
-    list_filter = ('email', 'username')
+    list_filter = ('is_staff', 'is_active')
+    search_fields = ('username', 'email')
+
+    def delete_model(self, request, obj):
+        """Метод удаления пользователя: пользователь деактивируется,
+        а его данные удаляются в очереди задач.
+        """
+
+        deletion.schedule_user_deletion(obj)
+
+    def delete_queryset(self, request, queryset):
+        """Метод удаления выбранных пользователей в очереди задач."""
+
+        for user in queryset:
+            deletion.schedule_user_deletion(user)
 
 
 @register(Subscription)
-class SubscriptionAdmin(ModelAdmin):
+class SubscriptionAdmin(LargeTableAdmin):
     list_display = ('user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    search_fields = ('user__username', 'author__username')